@@ -1,10 +1,31 @@
-import pytz
 import streamlit as st
-import sqlite3
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import functools
+import os
 import time
-import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import database
+import instrumentation
+import rerun_scheduler
+import timer_engine
+import timer_store
+from widgets import app_assets, countdown
+
+# pandas, plotly.express, charts e analytics (NumPy/pandas) são importados só quando
+# as estatísticas renderizam, para não atrasar o primeiro desenho do timer.
+# ZoneInfo guarda a instância em cache, então o fuso é resolvido uma única vez.
+BRAZIL_TZ = ZoneInfo('America/Sao_Paulo')
+
+# Opções do gráfico de progresso (dias, balde e tipo de gráfico)
+PROGRESS_PERIODS = {"7 dias": 7, "30 dias": 30, "90 dias": 90, "1 ano": 365, "Tudo": None}
+PROGRESS_BUCKETS = {"Automático": None, "Dia": 'day', "Semana": 'week', "Mês": 'month'}
+PROGRESS_VIEWS = {"Barras": 'bars', "Linha": 'line'}
+
+# Aceita ``?user=`` mesmo com login configurado (qualquer visitante lê e grava
+# as sessões de quem ele nomear; só para ambientes confiáveis)
+ALLOW_USER_PARAM = os.environ.get('POMODORO_ALLOW_USER_PARAM', '') == '1'
 
 # Configuração da página
 st.set_page_config(
@@ -14,115 +35,70 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# CSS personalizado para animações e estilo
-st.markdown("""
-<style>
-    .main-header {
-        text-align: center;
-        color: #e74c3c;
-        font-size: 3rem;
-        font-weight: bold;
-        margin-bottom: 2rem;
-        animation: pulse 2s infinite;
-    }
-
-    @keyframes pulse {
-        0% { transform: scale(1); }
-        50% { transform: scale(1.05); }
-        100% { transform: scale(1); }
-    }
-
-    .timer-display {
-        text-align: center;
-        font-size: 4rem;
-        font-weight: bold;
-        color: #2c3e50;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        margin: 2rem 0;
-        animation: glow 2s ease-in-out infinite alternate;
-    }
-
-    @keyframes glow {
-        from { text-shadow: 0 0 20px #667eea; }
-        to { text-shadow: 0 0 30px #764ba2; }
-    }
-
-    .status-text {
-        text-align: center;
-        font-size: 1.5rem;
-        color: #34495e;
-        margin-bottom: 2rem;
-    }
-
-    .session-counter {
-        text-align: center;
-        font-size: 1.2rem;
-        color: #27ae60;
-        font-weight: bold;
-        background-color: #ecf0f1;
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-    }
-
-    .celebration {
-        animation: bounce 1s ease infinite;
-    }
-
-    @keyframes bounce {
-        0%, 20%, 50%, 80%, 100% { transform: translateY(0); }
-        40% { transform: translateY(-30px); }
-        60% { transform: translateY(-15px); }
-    }
-
-    .stProgress > div > div > div > div {
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-    }
-
-    .digital-clock {
-        text-align: center;
-        font-size: 1.5rem;
-        font-weight: bold;
-        color: #2c3e50;
-        background: linear-gradient(135deg, #74b9ff 0%, #0984e3 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        padding: 0.5rem;
-        border: 2px solid #74b9ff;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-        font-family: 'Courier New', monospace;
-    }
-</style>
-
-
-""", unsafe_allow_html=True)
+
+def instrumented_rerun(func, kind='full', profile=False):
+    """Executa ``func`` como um rerun instrumentado da sessão (completo ou de fragmento)"""
+    previous_rerun = st.session_state.get('last_rerun_at')
+    st.session_state.last_rerun_at = time.time()
+    return instrumentation.run(func, session_id=PomodoroApp.session_id(),
+                               previous_rerun=previous_rerun, profile=profile, kind=kind)
+
+
+def profiled_fragment(func):
+    """Instrumenta o fragmento nos reruns em que ele roda sozinho
+
+    Num rerun completo o fragmento roda dentro do ``instrumentation.run`` do
+    script; num rerun de fragmento o script não roda, e sem isto o rerun não
+    teria duração, reruns por segundo nem fases registradas.
+    """
+    @functools.wraps(func)
+    def wrapper(self):
+        if instrumentation.ENABLED and self.is_fragment_rerun():
+            return instrumented_rerun(functools.partial(func, self), kind='fragment')
+        return func(self)
+    return wrapper
 
 
 class PomodoroApp:
     def __init__(self):
-        self.setup_database()
+        self.user_id = self.current_user()
         self.initialize_session_state()
 
-    def setup_database(self):
-        """Configura o banco de dados SQLite"""
-        self.conn = sqlite3.connect('../pomodoro_stats.db', check_same_thread=False)
-        self.cursor = self.conn.cursor()
-
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                session_type TEXT NOT NULL,
-                duration INTEGER NOT NULL,
-                completed BOOLEAN NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        self.conn.commit()
+    @staticmethod
+    def current_user():
+        """Identifica o usuário da sessão: login do Streamlit, ``?user=`` na URL ou o padrão
+
+        Com o login configurado (``[auth]`` nos secrets) o ``?user=`` é
+        ignorado, a menos que ``POMODORO_ALLOW_USER_PARAM=1``: senão quem não
+        entrou poderia se passar por qualquer usuário.
+        """
+        if 'user_id' not in st.session_state:
+            user_id = None
+            user = getattr(st, 'user', None)  # st.user existe a partir do Streamlit 1.42
+            if user is not None and user.get('is_logged_in'):
+                user_id = user.get('email') or user.get('sub')
+            elif ALLOW_USER_PARAM or not PomodoroApp.auth_configured():
+                user_id = st.query_params.get('user')
+            st.session_state.user_id = user_id or database.DEFAULT_USER
+        return st.session_state.user_id
+
+    @staticmethod
+    def auth_configured():
+        """O login do Streamlit está configurado (seção ``[auth]`` nos secrets)"""
+        try:
+            return 'auth' in st.secrets
+        except FileNotFoundError:  # nenhum secrets.toml
+            return False
+
+    @property
+    def db(self):
+        """Banco de dados SQLite do usuário, compartilhado pelo processo
+
+        Obtido a cada uso, sem guardar: um fragmento roda muito depois do rerun
+        que criou o app e o shard de um usuário sem uso recente é fechado
+        (``database.for_user``).
+        """
+        return database.for_user(self.user_id)
 
     def initialize_session_state(self):
         """Inicializa o estado da sessão"""
@@ -132,192 +108,140 @@ class PomodoroApp:
             st.session_state.break_time = 5 * 60  # 5 minutos
         if 'long_break_time' not in st.session_state:
             st.session_state.long_break_time = 15 * 60  # 15 minutos
-        if 'current_time' not in st.session_state:
-            st.session_state.current_time = st.session_state.work_time
-        if 'is_running' not in st.session_state:
-            st.session_state.is_running = False
-        if 'is_paused' not in st.session_state:
-            st.session_state.is_paused = False
-        if 'is_work_session' not in st.session_state:
-            st.session_state.is_work_session = True
-        if 'session_count' not in st.session_state:
-            st.session_state.session_count = 0
+        if 'timer' not in st.session_state:
+            st.session_state.timer = timer_engine.TimerState(st.session_state.work_time)
         if 'start_time' not in st.session_state:
             st.session_state.start_time = None
-        if 'total_time' not in st.session_state:
-            st.session_state.total_time = st.session_state.work_time
-        if 'completed_sessions' not in st.session_state:
-            st.session_state.completed_sessions = self.get_today_sessions()
         if 'celebration' not in st.session_state:
             st.session_state.celebration = False
-        if 'last_update' not in st.session_state:
-            st.session_state.last_update = time.time()
+        if 'sound' not in st.session_state:
+            st.session_state.sound = None
+        if 'schedule' not in st.session_state:
+            st.session_state.schedule = rerun_scheduler.RerunSchedule()
+        self.sync_timer()
 
     @staticmethod
-    def format_time(seconds):
-        """Formata tempo em MM:SS"""
-        minutes = seconds // 60
-        seconds = seconds % 60
-        return f"{minutes:02d}:{seconds:02d}"
+    def durations():
+        """Obtém as durações configuradas para o motor do timer"""
+        return timer_engine.Durations(
+            work=st.session_state.work_time,
+            short_break=st.session_state.break_time,
+            long_break=st.session_state.long_break_time,
+        )
 
+    @instrumentation.timed_query
     def get_today_sessions(self):
         """Obtém número de sessões completadas hoje"""
         today = datetime.now().strftime('%Y-%m-%d')
-        self.cursor.execute('''
-            SELECT COUNT(*) FROM sessions 
-            WHERE date = ? AND completed = 1 AND session_type = 'work'
-        ''', (today,))
-        return self.cursor.fetchone()[0]
+        count, _ = self.db.daily_rollup(today, today, self.user_id).get((today, 'work', 1), (0, 0))
+        return count
 
+    @instrumentation.timed_query
     def save_session(self, session_type, duration, completed):
         """Salva sessão no banco de dados"""
         today = datetime.now().strftime('%Y-%m-%d')
-        self.cursor.execute('''
-            INSERT INTO sessions (date, session_type, duration, completed)
-            VALUES (?, ?, ?, ?)
-        ''', (today, session_type, duration, completed))
-        self.conn.commit()
+        self.db.save_sessions([(self.user_id, today, session_type, duration, completed)])
+
+    @instrumentation.timed_query
+    def sync_timer(self):
+        """Adota o timer gravado por outra sessão ou processo (POMODORO_TIMER_STORE=1)
+
+        Retorna True se o estado da sessão mudou.
+        """
+        if not timer_store.enabled_for(self.user_id):
+            return False
+        stored = timer_store.load(self.db, self.user_id)
+        version = stored.version if stored is not None else 0
+        if version == st.session_state.get('timer_version'):
+            return False
+        st.session_state.timer_version = version
+        if stored is None:
+            return False
+        st.session_state.timer = stored.state
+        st.session_state.work_time = stored.durations.work
+        st.session_state.break_time = stored.durations.short_break
+        st.session_state.long_break_time = stored.durations.long_break
+        return True
+
+    @instrumentation.timed_query
+    def save_timer(self):
+        """Grava o timer depois de uma transição (POMODORO_TIMER_STORE=1)
+
+        Retorna False se outra sessão gravou antes: a transição desta sessão
+        é descartada e o estado gravado é adotado.
+        """
+        if not timer_store.enabled_for(self.user_id):
+            return True
+        version = timer_store.save(self.db, self.user_id, st.session_state.timer,
+                                   self.durations(), st.session_state.get('timer_version', 0))
+        if version is None:
+            self.sync_timer()
+            return False
+        st.session_state.timer_version = version
+        return True
 
     def start_timer(self):
         """Inicia o timer"""
-        if not st.session_state.is_running:
-            st.session_state.is_running = True
-            st.session_state.is_paused = False
+        if timer_engine.start_timer(st.session_state.timer) and self.save_timer():
             st.session_state.start_time = time.time()
-            st.session_state.last_update = time.time()
             self.play_sound("start")
 
     def pause_timer(self):
         """Pausa o timer"""
-        if st.session_state.is_running:
-            st.session_state.is_paused = not st.session_state.is_paused
-            if not st.session_state.is_paused:
-                st.session_state.last_update = time.time()
+        self.update_timer()
+        if timer_engine.pause_timer(st.session_state.timer):
+            self.save_timer()
 
     def stop_timer(self):
         """Para o timer"""
-        if st.session_state.is_running or st.session_state.is_paused:
+        record = timer_engine.stop_timer(st.session_state.timer, self.durations())
+        if record is not None and self.save_timer():
             # Salvar sessão como incompleta
-            session_type = "work" if st.session_state.is_work_session else "break"
-            elapsed = st.session_state.total_time - st.session_state.current_time
-            self.save_session(session_type, elapsed, False)
-
-            st.session_state.is_running = False
-            st.session_state.is_paused = False
-            st.session_state.current_time = st.session_state.work_time
-            st.session_state.total_time = st.session_state.work_time
-            st.session_state.is_work_session = True
+            self.save_session(*record)
 
     def complete_session(self):
         """Completa uma sessão"""
-        session_type = "work" if st.session_state.is_work_session else "break"
-        self.save_session(session_type, st.session_state.total_time, True)
+        timer = st.session_state.timer
+        record = timer_engine.complete_session(timer, self.durations())
+        if not self.save_timer():
+            return  # outra sessão já completou esta fase
+        self.save_session(*record)
 
-        if st.session_state.is_work_session:
-            st.session_state.session_count += 1
-            st.session_state.completed_sessions += 1
+        if record[0] == 'work':
             st.session_state.celebration = True
             self.play_sound("complete")
             self.show_notification("🎉 Sessão de trabalho completada! Hora da pausa!", "success")
 
-            # Alternar para pausa
-            if st.session_state.session_count % 4 == 0:
-                st.session_state.current_time = st.session_state.long_break_time
-                st.session_state.total_time = st.session_state.long_break_time
+            if timer.phase == timer_engine.LONG_BREAK:
                 self.show_notification("🏖️ Você merece uma pausa longa!", "info")
             else:
-                st.session_state.current_time = st.session_state.break_time
-                st.session_state.total_time = st.session_state.break_time
                 self.show_notification("☕ Hora da pausa curta!", "info")
-            st.session_state.is_work_session = False
         else:
-            # Alternar para trabalho
-            st.session_state.current_time = st.session_state.work_time
-            st.session_state.total_time = st.session_state.work_time
-            st.session_state.is_work_session = True
             self.play_sound("start")
             self.show_notification("💼 Pausa terminada! Hora de focar no trabalho!", "info")
 
-        st.session_state.is_running = False
-        st.session_state.is_paused = False
-
-    def update_timer(self):
-        """Atualiza o timer"""
-        current_time = time.time()
-        if st.session_state.is_running and not st.session_state.is_paused:
-            elapsed = current_time - st.session_state.last_update
-            if elapsed >= 1.0:  # Atualizar a cada segundo
-                if st.session_state.current_time > 0:
-                    st.session_state.current_time -= 1
-                    st.session_state.last_update = current_time
-                else:
-                    self.complete_session()
+    def update_timer(self, expired=False):
+        """Atualiza o timer a partir do prazo final
+
+        ``expired`` indica que o navegador já chegou a 00:00 nesta sessão.
+        """
+        timer = st.session_state.timer
+        if expired or timer_engine.is_expired(timer):
+            self.complete_session()
+            return True
+        return False
 
     @staticmethod
     def play_sound(sound_type):
-        """Reproduz som usando JavaScript"""
+        """Reproduz som no navegador pelo componente de assets"""
         if sound_type == "start":
             st.success("🎵 Timer iniciado!")
-
-            # Som via JavaScript
-            st.markdown("""
-                <script>
-                (function() {
-                    try {
-                        const audioContext = new (window.AudioContext || window.webkitAudioContext)();
-                        const oscillator = audioContext.createOscillator();
-                        const gainNode = audioContext.createGain();
-
-                        oscillator.connect(gainNode);
-                        gainNode.connect(audioContext.destination);
-
-                        oscillator.frequency.setValueAtTime(440, audioContext.currentTime);
-                        oscillator.type = 'sine';
-                        gainNode.gain.setValueAtTime(0.3, audioContext.currentTime);
-                        gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + 0.5);
-
-                        oscillator.start(audioContext.currentTime);
-                        oscillator.stop(audioContext.currentTime + 0.5);
-                    } catch(e) {
-                        console.log('Audio não suportado:', e);
-                    }
-                })();
-                </script>
-            """, unsafe_allow_html=True)
-
         elif sound_type == "complete":
             st.balloons()
             st.success("🎉 Sessão completada!")
 
-            # Som de conclusão mais elaborado
-            st.markdown("""
-                <script>
-                (function() {
-                    try {
-                        const audioContext = new (window.AudioContext || window.webkitAudioContext)();
-                        const frequencies = [523, 659, 784]; // C, E, G
-
-                        frequencies.forEach((freq, index) => {
-                            const oscillator = audioContext.createOscillator();
-                            const gainNode = audioContext.createGain();
-
-                            oscillator.connect(gainNode);
-                            gainNode.connect(audioContext.destination);
-
-                            oscillator.frequency.setValueAtTime(freq, audioContext.currentTime);
-                            oscillator.type = 'sine';
-                            gainNode.gain.setValueAtTime(0.3, audioContext.currentTime + index * 0.2);
-                            gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + (index * 0.2) + 0.3);
-
-                            oscillator.start(audioContext.currentTime + index * 0.2);
-                            oscillator.stop(audioContext.currentTime + (index * 0.2) + 0.3);
-                        });
-                    } catch(e) {
-                        console.log('Audio não suportado:', e);
-                    }
-                })();
-                </script>
-            """, unsafe_allow_html=True)
+        # Fica na sessão até o próximo desenho do componente (mesmo após st.rerun())
+        st.session_state.sound = {'name': sound_type, 'id': time.time_ns()}
 
     @staticmethod
     def show_notification(message, notification_type="info"):
@@ -331,47 +255,77 @@ class PomodoroApp:
         else:
             st.info(message)
 
-    def get_weekly_stats(self):
-        """Obtém estatísticas da semana"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=6)
-
-        self.cursor.execute('''
-            SELECT date, session_type, COUNT(*) as count
-            FROM sessions 
-            WHERE date >= ? AND date <= ? AND completed = 1
-            GROUP BY date, session_type
-            ORDER BY date
-        ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-
-        return self.cursor.fetchall()
+    @instrumentation.timed_query
+    def get_progress_stats(self, start, end):
+        """Obtém os agregados diários do período (``YYYY-MM-DD``, inclusivo)"""
+        return self.db.daily_rollup(start, end, self.user_id)
 
+    @instrumentation.timed_query
     def get_daily_stats(self):
         """Obtém estatísticas do dia"""
         today = datetime.now().strftime('%Y-%m-%d')
 
-        self.cursor.execute('''
-            SELECT session_type, COUNT(*) as count, SUM(duration) as total_duration
-            FROM sessions 
-            WHERE date = ? AND completed = 1
-            GROUP BY session_type
-        ''', (today,))
-
-        return self.cursor.fetchall()
-
-    def create_progress_chart(self):
-        """Cria gráfico de progresso semanal"""
-        data = self.get_weekly_stats()
+        rollup = self.db.daily_rollup(today, today, self.user_id)
+        return [(session_type, count, total_duration)
+                for (_, session_type, completed), (count, total_duration) in sorted(rollup.items())
+                if completed]
+
+    def create_progress_chart(self, days=7, bucket=None, view='bars'):
+        """Cria o gráfico de progresso dos últimos ``days`` dias (``None``: tudo)
+
+        ``bucket`` é o agrupamento pedido (dia, semana ou mês; ``None`` escolhe
+        sozinho). Barras e pontos são limitados no servidor, então o tamanho
+        da figura não depende do período.
+        """
+        end = datetime.now().strftime('%Y-%m-%d')
+        if days is None:
+            start = self.db.first_date(self.user_id) or end
+        else:
+            start = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        rollup = self.get_progress_stats(start, end)
 
-        if not data:
+        if not any(completed for _, _, completed in rollup):
             st.info("📊 Sem dados para exibir. Complete algumas sessões para ver suas estatísticas!")
             return
 
-        df = pd.DataFrame(data, columns=['date', 'session_type', 'count'])
+        # Só com dados: charts importa pandas, que fica fora do primeiro desenho
+        import charts
+
+        # A figura é memoizada pelos pontos já reduzidos, então só é
+        # reconstruída quando uma sessão é salva ou o dia muda
+        if view == 'line':
+            bucket = bucket or 'day'
+            starts, minutes = charts.focus_series(rollup, start, end, bucket)
+            total_points = len(starts)
+            starts, minutes = charts.downsample(starts, minutes)
+            points = tuple(zip(starts.astype(str), minutes.tolist()))
+            fig = self.db.cache.get(('focus_chart', bucket, points),
+                                    lambda: self.build_focus_figure(points, bucket))
+            if len(points) < total_points:
+                st.caption(f"{len(points)} de {total_points} pontos (LTTB)")
+        else:
+            chosen = charts.choose_bucket(start, end, bucket)
+            data = charts.resample(rollup, chosen)
+            fig = self.db.cache.get(('progress_chart', chosen, data),
+                                    lambda: self.build_progress_figure(data, chosen))
+            if chosen != (bucket or 'day'):
+                st.caption(f"Agrupado por {charts.BUCKET_NAMES[chosen]} "
+                           f"(até {charts.MAX_BARS} barras)")
+        st.plotly_chart(fig, use_container_width=True)
+
+    @staticmethod
+    def build_progress_figure(data, bucket='day'):
+        """Monta o gráfico de barras de sessões completadas por balde"""
+        import pandas as pd
+        import plotly.express as px
+
+        import charts
+
+        df = pd.DataFrame(list(data), columns=['date', 'session_type', 'count'])
 
         # Gráfico de barras
         fig = px.bar(df, x='date', y='count', color='session_type',
-                     title='📈 Sessões Completadas nos Últimos 7 Dias',
+                     title=f'📈 Sessões Completadas por {charts.BUCKET_NAMES[bucket].capitalize()}',
                      labels={'count': 'Número de Sessões', 'date': 'Data'},
                      color_discrete_map={'work': '#e74c3c', 'break': '#3498db'})
 
@@ -379,9 +333,68 @@ class PomodoroApp:
             plot_bgcolor='rgba(0,0,0,0)',
             paper_bgcolor='rgba(0,0,0,0)',
             font=dict(size=12),
-            showlegend=True
+            showlegend=True,
+            # O tema do Streamlit substitui o template padrão do plotly no
+            # navegador, que ocupava a maior parte do spec enviado
+            template=None
+        )
+        return fig
+
+    @staticmethod
+    def build_focus_figure(points, bucket='day'):
+        """Monta o gráfico de linha de minutos de foco por balde"""
+        import plotly.express as px
+
+        import charts
+
+        dates, minutes = zip(*points)
+        fig = px.line(x=list(dates), y=list(minutes),
+                      title=f'⏱️ Minutos de Foco por {charts.BUCKET_NAMES[bucket].capitalize()}',
+                      labels={'x': 'Data', 'y': 'Minutos'},
+                      color_discrete_sequence=['#e74c3c'])
+        fig.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(size=12),
+            template=None
         )
+        return fig
+
+    def create_long_range_analytics(self):
+        """Cria análises de longo prazo (90 dias ou 1 ano)"""
+        import plotly.express as px
+
+        import analytics
+
+        period = st.radio("Período", ["90 dias", "1 ano"], horizontal=True)
+        report = analytics.report(self.db, 90 if period == "90 dias" else 365, self.user_id)
+
+        if not report['sessions']:
+            st.info("🔎 Sem sessões no período selecionado.")
+            return
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("🔥 Sequência atual", f"{report['current_streak']} dias",
+                      delta=f"recorde: {report['longest_streak']} dias", delta_color="off")
+        with col2:
+            st.metric("⏱️ Tempo de foco", f"{report['focus_minutes'] / 60:.1f} h")
+        with col3:
+            st.metric("✅ Taxa de conclusão", f"{report['completion_rate']:.0%}")
+        with col4:
+            st.metric("🚫 Abandonadas por concluída", f"{report['abandon_ratio']:.2f}",
+                      delta=f"{report['abandoned']} abandonadas", delta_color="off")
+
+        fig = px.bar(x=list(range(24)), y=report['focus_by_hour'],
+                     title='🕐 Minutos de Foco por Hora do Dia',
+                     labels={'x': 'Hora', 'y': 'Minutos'},
+                     color_discrete_sequence=['#e74c3c'])
+        st.plotly_chart(fig, use_container_width=True)
 
+        fig = px.imshow(report['weekday_heatmap'], x=list(range(24)), y=list(analytics.WEEKDAYS),
+                        title='📅 Minutos de Foco por Dia da Semana e Hora',
+                        labels={'x': 'Hora', 'y': 'Dia', 'color': 'Minutos'},
+                        color_continuous_scale='Reds', aspect='auto')
         st.plotly_chart(fig, use_container_width=True)
 
     def create_daily_stats(self):
@@ -413,101 +426,243 @@ class PomodoroApp:
                         delta=f"{hours}h {minutes}m de descanso"
                     )
 
-    def run(self):
-        """Executa a aplicação principal"""
-        # Cabeçalho
-        celebration_class = "celebration" if st.session_state.celebration else ""
-        st.markdown(f'<h1 class="main-header {celebration_class}">🍅 POMODORO TIMER PRO</h1>',
-                    unsafe_allow_html=True)
+    def create_debug_panel(self, profiler):
+        """Cria painel com o tempo gasto em cada parte do rerun"""
+        with st.expander("🐞 Desempenho do Rerun"):
+            st.caption(f"Rerun atual até aqui: {profiler.elapsed() * 1000:.1f} ms")
+            st.table({
+                'Fase': [name for name, _ in profiler.phases],
+                'ms': [f"{elapsed * 1000:.2f}" for _, elapsed in profiler.phases],
+            })
+
+            queries = instrumentation.REGISTRY.snapshot('pomodoro_query_seconds', 'method')
+            if queries:
+                st.table({
+                    'Consulta': list(queries),
+                    'Chamadas': [count for count, _ in queries.values()],
+                    'Média (ms)': [f"{total / count * 1000:.3f}" for count, total in queries.values()],
+                })
+
+            cache = self.db.cache
+            st.caption(f"Cache: {cache.hits} acertos, {cache.misses} faltas, "
+                       f"{len(cache)} entradas, versão {cache.version}")
+            if self.db.session_writer is not None:
+                st.json(self.db.session_writer.metrics())
+
+            schedule = st.session_state.schedule
+            interval = f"{schedule.interval:g} s" if schedule.interval else "parado"
+            st.caption(f"Relógio: {interval}; reruns automáticos por hora ociosa: "
+                       f"{schedule.idle_reruns_per_hour():.0f} nesta sessão, "
+                       f"{rerun_scheduler.idle_reruns_per_hour():.0f} no processo")
+
+            session_id = self.session_id()
+            if st.button("📸 Perfilar próximo rerun (cProfile)"):
+                st.session_state.profile_next_rerun = True
+            path = instrumentation.last_profile(session_id)
+            if path:
+                st.caption(f"Último perfil: `{path}`")
 
-        # Reset celebration
-        if st.session_state.celebration:
-            st.session_state.celebration = False
+    @staticmethod
+    def session_id():
+        """Identificador da sessão do navegador no Streamlit"""
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else None
 
-        # Layout principal
-        col1, col2 = st.columns([2, 1])
+    @staticmethod
+    def is_fragment_rerun():
+        """Indica se este rerun executa só um fragmento"""
+        ctx = get_script_run_ctx()
+        return ctx is not None and bool(ctx.fragment_ids_this_run)
+
+    @classmethod
+    def rerun_fragment(cls):
+        """Redesenha só o fragmento atual (ou o app inteiro, num rerun completo)"""
+        if cls.is_fragment_rerun():
+            st.rerun(scope="fragment")
+        st.rerun()
 
-        with col1:
-            # Display do timer
-            time_display = self.format_time(st.session_state.current_time)
-            st.markdown(f'<div class="timer-display">{time_display}</div>',
-                        unsafe_allow_html=True)
+    @staticmethod
+    def scheduled_rerun():
+        """Rerun completo pedido pelo app, sem interação do usuário"""
+        st.session_state.scheduled_rerun = True
+        st.rerun()
+
+    def track_rerun(self):
+        """Registra um rerun completo na agenda da sessão"""
+        schedule = st.session_state.schedule
+        automatic = st.session_state.pop('scheduled_rerun', False)
+        schedule.record_rerun(st.session_state.timer.deadline is not None, automatic)
+        if not automatic:
+            schedule.interacted()
+
+    def reschedule(self):
+        """Pede um rerun completo se o intervalo do relógio precisa mudar
+
+        Só vale em reruns de fragmento: um rerun completo já registra o
+        intervalo atual ao desenhar o relógio.
+        """
+        if (self.is_fragment_rerun() and st.session_state.schedule.needs_reschedule(
+                st.session_state.timer.deadline is not None)):
+            self.scheduled_rerun()
+
+    def user_activity(self):
+        """Registra a interação que causou um rerun de fragmento
+
+        Chamado no fim do fragmento, depois dos widgets: o rerun completo
+        pedido por ``reschedule`` descartaria o clique de um botão.
+        """
+        if self.is_fragment_rerun():
+            st.session_state.schedule.interacted()
+            self.reschedule()
+
+    @st.fragment
+    @profiled_fragment
+    def timer_panel(self):
+        """Timer, status e controles
+
+        Cliques e o aviso de prazo expirado reexecutam só este fragmento; o app
+        inteiro só roda de novo quando uma sessão é gravada, para atualizar o
+        contador e as estatísticas.
+        """
+        profiler = instrumentation.current()
+
+        # O componente de assets avisa quando a aba fica escondida ou volta;
+        # voltar para a aba conta como interação
+        schedule = st.session_state.schedule
+        visible = (st.session_state.get('assets') or {}).get('visible', True)
+        if visible != schedule.visible:
+            schedule.visible = visible
+            if visible:
+                schedule.interacted()
+        elif self.is_fragment_rerun():
+            schedule.interacted()
+
+        # Sincroniza o timer com o prazo final (o navegador avisa quando expira)
+        # e com o estado gravado por outras sessões do usuário
+        with profiler.phase('sync'):
+            if self.is_fragment_rerun():
+                self.sync_timer()
+            timer = st.session_state.timer
+            event = st.session_state.get('countdown')
+            expired = (
+                event is not None
+                and event.get('event') == 'expired'
+                and timer.deadline is not None
+                and event.get('token') == timer.deadline
+            )
+            completed = self.update_timer(expired=expired)
+
+        # CSS e sons vêm de arquivos estáticos do componente, carregados uma
+        # vez por navegador; a cada rerun só vai o último som pedido (depois
+        # da sincronização, para tocar no mesmo rerun em que a fase termina)
+        app_assets(sound=st.session_state.sound, key='assets')
+
+        if completed:
+            self.scheduled_rerun()
+
+        with profiler.phase('timer'):
+            # Display do timer e barra de progresso, animados no navegador
+            countdown(
+                remaining=timer_engine.remaining(timer),
+                total=timer.total,
+                running=timer.deadline is not None,
+                token=timer.deadline,
+                key='countdown',
+            )
 
             # Status
-            if st.session_state.is_work_session:
-                status = "💼 Sessão de Trabalho" if st.session_state.is_running else "Pronto para trabalhar 💪"
-                if st.session_state.session_count % 4 == 3 and st.session_state.session_count > 0:
+            if timer.is_work_session:
+                status = "💼 Sessão de Trabalho" if timer.is_running else "Pronto para trabalhar 💪"
+                if timer.cycle_count % timer_engine.LONG_BREAK_EVERY == timer_engine.LONG_BREAK_EVERY - 1:
                     status += " (Próxima: Pausa Longa)"
             else:
-                if st.session_state.total_time == st.session_state.long_break_time:
-                    status = "🏖️ Pausa Longa" if st.session_state.is_running else "Hora da pausa longa! 🏖️"
+                if timer.phase == timer_engine.LONG_BREAK:
+                    status = "🏖️ Pausa Longa" if timer.is_running else "Hora da pausa longa! 🏖️"
                 else:
-                    status = "☕ Pausa Curta" if st.session_state.is_running else "Hora da pausa! ☕"
+                    status = "☕ Pausa Curta" if timer.is_running else "Hora da pausa! ☕"
 
-            if st.session_state.is_paused:
+            if timer.is_paused:
                 status = "⏸️ PAUSADO"
 
             st.markdown(f'<div class="status-text">{status}</div>', unsafe_allow_html=True)
 
-            # Barra de progresso
-            progress = 1 - (st.session_state.current_time / st.session_state.total_time)
-            st.progress(progress)
-
             # Botões de controle
             col_btn1, col_btn2, col_btn3, col_btn4 = st.columns(4)
 
             with col_btn1:
-                if st.button("▶️ INICIAR", type="primary", disabled=st.session_state.is_running):
+                if st.button("▶️ INICIAR", type="primary", disabled=timer.is_running):
                     self.start_timer()
                     self.show_notification("⏰ Timer iniciado! Foque no seu trabalho!", "success")
-                    st.rerun()
+                    self.rerun_fragment()
 
             with col_btn2:
-                pause_text = "▶️ CONTINUAR" if st.session_state.is_paused else "⏸️ PAUSAR"
-                if st.button(pause_text, disabled=not st.session_state.is_running):
+                pause_text = "▶️ CONTINUAR" if timer.is_paused else "⏸️ PAUSAR"
+                if st.button(pause_text, disabled=not timer.is_running):
                     self.pause_timer()
-                    if st.session_state.is_paused:
+                    if timer.is_paused:
                         self.show_notification("⏸️ Timer pausado", "warning")
                     else:
                         self.show_notification("▶️ Timer retomado!", "info")
-                    st.rerun()
+                    self.rerun_fragment()
 
             with col_btn3:
                 if st.button("⏹️ PARAR", type="secondary"):
                     self.stop_timer()
                     self.show_notification("⏹️ Timer parado", "warning")
+                    # A sessão interrompida é gravada: atualiza o app inteiro
                     st.rerun()
 
             with col_btn4:
                 if st.button("🔄 RESET"):
-                    st.session_state.current_time = st.session_state.work_time
-                    st.session_state.total_time = st.session_state.work_time
-                    st.session_state.is_work_session = True
-                    st.session_state.is_running = False
-                    st.session_state.is_paused = False
+                    timer_engine.reset_timer(timer, self.durations())
+                    self.save_timer()
                     self.show_notification("🔄 Timer resetado!", "info")
-                    st.rerun()
-        BRAZIL_TZ = pytz.timezone('America/Sao_Paulo')
-        with col2:
-
-            # Relógio Digital
-            current_time = datetime.now(BRAZIL_TZ)
-            time_str = current_time.strftime("%H:%M:%S")
-            date_str = current_time.strftime("%d/%m/%Y")
-
-            st.markdown(f"""
-                <div class="digital-clock">
-                    <div class="current-time">
-                        🕐 {time_str}<br>📅 {date_str}
-                    </div>
+                    self.rerun_fragment()
+
+        # Depois dos botões, para o rerun completo não descartar um clique
+        self.reschedule()
+
+    @profiled_fragment
+    def clock(self):
+        """Relógio digital, um fragmento com o intervalo da agenda da sessão
+
+        Sem os segundos quando a sessão está ociosa e o intervalo é maior.
+        """
+        schedule = st.session_state.schedule
+        if self.is_fragment_rerun():
+            # Rerun automático do run_every; traz para esta aba as transições
+            # feitas em outra aba ou outro processo do mesmo usuário
+            if self.sync_timer():
+                self.scheduled_rerun()
+            schedule.record_rerun(st.session_state.timer.deadline is not None, automatic=True)
+            self.reschedule()
+
+        current_time = datetime.now(BRAZIL_TZ)
+        seconds = schedule.interval == rerun_scheduler.ACTIVE_INTERVAL
+        time_str = current_time.strftime("%H:%M:%S" if seconds else "%H:%M")
+        date_str = current_time.strftime("%d/%m/%Y")
+
+        st.markdown(f"""
+            <div class="digital-clock">
+                <div class="current-time">
+                    🕐 {time_str}<br>📅 {date_str}
                 </div>
-            """, unsafe_allow_html=True)
+            </div>
+        """, unsafe_allow_html=True)
+
+    @st.fragment
+    @profiled_fragment
+    def settings_panel(self):
+        """Contador de sessões e configurações; os sliders reexecutam só este fragmento"""
+        timer = st.session_state.timer
+        profiler = instrumentation.current()
 
+        with profiler.phase('settings'):
             # Contador de sessões
             st.markdown(f'''
                 <div class="session-counter">
-                    🏆 Sessões Hoje: {st.session_state.completed_sessions}<br>
-                    🔥 Total na Sessão: {st.session_state.session_count}
+                    🏆 Sessões Hoje: {self.get_today_sessions()}<br>
+                    🔥 Total na Sessão: {timer.cycle_count}
                 </div>
             ''', unsafe_allow_html=True)
 
@@ -523,36 +678,90 @@ class PomodoroApp:
                 st.session_state.break_time = break_min * 60
                 st.session_state.long_break_time = long_break_min * 60
 
-                if not st.session_state.is_running:
-                    st.session_state.current_time = st.session_state.work_time
-                    st.session_state.total_time = st.session_state.work_time
+                if not timer.is_running:
+                    timer.total = self.durations().for_phase(timer.phase)
+                self.save_timer()
 
                 st.success("✅ Configurações salvas!")
+                # A nova duração aparece no timer, que é outro fragmento
                 st.rerun()
 
-        # Estatísticas
+        self.user_activity()
+
+    @st.fragment
+    @profiled_fragment
+    def stats_panel(self):
+        """Estatísticas; só mudam quando uma sessão é gravada (rerun completo)"""
+        profiler = instrumentation.current()
+
         st.header("📊 Estatísticas")
 
         # Stats do dia
         st.subheader("📅 Hoje")
-        self.create_daily_stats()
+        with profiler.phase('daily_stats'):
+            self.create_daily_stats()
+
+        # Gráfico de progresso
+        st.subheader("📈 Progresso")
+        col_period, col_bucket, col_view = st.columns(3)
+        with col_period:
+            period = st.selectbox("Período", list(PROGRESS_PERIODS), key='progress_period')
+        with col_bucket:
+            bucket = st.selectbox("Agrupar por", list(PROGRESS_BUCKETS), key='progress_bucket')
+        with col_view:
+            view = st.radio("Visualização", list(PROGRESS_VIEWS), horizontal=True,
+                            key='progress_view')
+        with profiler.phase('progress_chart'):
+            self.create_progress_chart(PROGRESS_PERIODS[period], PROGRESS_BUCKETS[bucket],
+                                       PROGRESS_VIEWS[view])
+
+        # Análises de longo prazo (só calculadas quando abertas)
+        if st.toggle("🔎 Análises de Longo Prazo"):
+            with profiler.phase('analytics'):
+                self.create_long_range_analytics()
+
+        self.user_activity()
+
+    def run(self):
+        """Executa a aplicação principal
 
-        # Gráfico semanal
-        st.subheader("📈 Últimos 7 Dias")
-        self.create_progress_chart()
+        Com o timer rodando, a contagem acontece no navegador; cada parte da
+        página é um fragmento que reexecuta sozinho, e o relógio tem o seu
+        próprio intervalo, definido pela agenda de reruns da sessão.
+        """
+        profiler = instrumentation.current()
 
-        # Auto-atualização do timer e relógio
-        if st.session_state.is_running and not st.session_state.is_paused:
-            self.update_timer()
-            time.sleep(0.1)  # Pequena pausa para evitar sobrecarga
-            st.rerun()
-        else:
-            # Atualizar apenas o relógio quando timer não está rodando
-            time.sleep(1)
-            st.rerun()
+        # Cabeçalho
+        celebration_class = "celebration" if st.session_state.celebration else ""
+        st.markdown(f'<h1 class="main-header {celebration_class}">🍅 POMODORO TIMER PRO</h1>',
+                    unsafe_allow_html=True)
+
+        # Reset celebration
+        if st.session_state.celebration:
+            st.session_state.celebration = False
+
+        # Layout principal
+        col1, col2 = st.columns([2, 1])
+
+        with col1:
+            self.timer_panel()
+
+        with col2:
+            # O navegador só troca o run_every de um fragmento num rerun completo
+            schedule = st.session_state.schedule
+            schedule.interval = schedule.desired(st.session_state.timer.deadline is not None)
+            st.fragment(self.clock, run_every=schedule.interval)()
+            self.settings_panel()
+
+        # Estatísticas
+        self.stats_panel()
+
+        if instrumentation.ENABLED:
+            self.create_debug_panel(profiler)
 
 
 # Executar aplicação
 if __name__ == "__main__":
     app = PomodoroApp()
-    app.run()
\ No newline at end of file
+    app.track_rerun()
+    instrumented_rerun(app.run, profile=st.session_state.pop('profile_next_rerun', False))
\ No newline at end of file
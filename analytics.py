@@ -0,0 +1,232 @@
+"""Análises de longo prazo (90 dias, 1 ano) sobre a tabela ``sessions``
+
+As sessões do último ano ficam em memória em formato colunar (arrays NumPy)
+e são atualizadas de forma incremental: a cada nova escrita só as linhas com
+``id`` maior que o último carregado são lidas. Todas as métricas são
+calculadas de forma vetorizada sobre uma janela dessas colunas: foco por
+hora do dia, mapa de calor por dia da semana, sequências de dias, taxa de
+conclusão e proporção de sessões abandonadas.
+"""
+import threading
+from datetime import date as date_type, timedelta
+
+import numpy as np
+import pandas as pd
+
+from database import DEFAULT_USER
+
+TIMEZONE = 'America/Sao_Paulo'
+WEEKDAYS = ('Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom')
+HISTORY_DAYS = 366
+
+SELECT_NEW_SESSIONS = '''
+    SELECT id, date, timestamp, session_type = 'work', duration, completed
+    FROM sessions
+    WHERE user_id = ? AND id > ? AND date >= ?
+    ORDER BY id
+'''
+
+
+def day_number(value):
+    """Dias desde 1970-01-01 de uma data ``date`` ou ``YYYY-MM-DD``"""
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+class SessionColumns:
+    """Sessões em formato colunar
+
+    ``day`` são dias desde 1970-01-01 (data local gravada pelo app) e
+    ``epoch`` os segundos UTC do ``timestamp`` da linha.
+    """
+
+    __slots__ = ('id', 'day', 'epoch', 'is_work', 'duration', 'completed')
+
+    def __init__(self, id, day, epoch, is_work, duration, completed):
+        self.id = id
+        self.day = day
+        self.epoch = epoch
+        self.is_work = is_work
+        self.duration = duration
+        self.completed = completed
+
+    @classmethod
+    def empty(cls):
+        return cls(*(np.empty(0, dtype=dtype) for dtype in
+                     (np.int64, np.int64, np.int64, bool, np.int64, bool)))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Converte linhas de ``SELECT_NEW_SESSIONS``"""
+        if not rows:
+            return cls.empty()
+        ids, dates, timestamps, is_work, durations, completed = zip(*rows)
+        stamps = np.array(timestamps, dtype='datetime64[s]')
+        columns = cls(
+            np.array(ids, dtype=np.int64),
+            np.array(dates, dtype='datetime64[D]').astype(np.int64),
+            stamps.astype(np.int64),
+            np.array(is_work, dtype=bool),
+            np.array(durations, dtype=np.int64),
+            np.array(completed, dtype=bool),
+        )
+        # Linhas sem timestamp (NaT, o menor int64) estourariam a tabela de
+        # horas locais e ficam de fora
+        valid = ~np.isnat(stamps)
+        return columns if valid.all() else columns.select(valid)
+
+    def append(self, other):
+        return SessionColumns(*(np.concatenate((getattr(self, name), getattr(other, name)))
+                                for name in self.__slots__))
+
+    def select(self, mask):
+        return SessionColumns(*(getattr(self, name)[mask] for name in self.__slots__))
+
+    def __len__(self):
+        return len(self.id)
+
+
+class SessionHistory:
+    """Último ano de sessões de um usuário em memória, atualizado pelas novas linhas"""
+
+    def __init__(self, db, user_id=DEFAULT_USER, days=HISTORY_DAYS):
+        self.db = db
+        self.user_id = user_id
+        self.days = days
+        self.columns = SessionColumns.empty()
+        self.last_id = 0
+        self.version = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Carrega as sessões gravadas desde a última atualização"""
+        with self._lock:
+            if self.version == self.db.cache.version:
+                return self.columns
+            version = self.db.cache.version
+            horizon = (date_type.today() - timedelta(days=self.days)).strftime('%Y-%m-%d')
+            with self.db.reader() as conn:
+                rows = conn.execute(SELECT_NEW_SESSIONS,
+                                    (self.user_id, self.last_id, horizon)).fetchall()
+            columns = self.columns
+            if rows:
+                columns = columns.append(SessionColumns.from_rows(rows))
+                self.last_id = int(rows[-1][0])
+            # Descarta o que saiu do horizonte
+            oldest = day_number(horizon)
+            expired = columns.day < oldest
+            if expired.any():
+                columns = columns.select(~expired)
+            self.columns = columns
+            self.version = version
+            return columns
+
+    def reset(self):
+        """Descarta as colunas em memória (após remoções ou reescritas da tabela)"""
+        with self._lock:
+            self.columns = SessionColumns.empty()
+            self.last_id = 0
+            self.version = None
+
+    def window(self, start, end):
+        """Sessões entre ``start`` e ``end`` (``YYYY-MM-DD``, inclusivo)"""
+        columns = self.refresh()
+        return columns.select((columns.day >= day_number(start)) & (columns.day <= day_number(end)))
+
+
+_histories = {}
+_histories_lock = threading.Lock()
+
+
+def get_history(db, user_id=DEFAULT_USER):
+    """Obtém o histórico compartilhado do processo para o usuário no banco"""
+    key = (db.path, user_id)
+    with _histories_lock:
+        history = _histories.get(key)
+        # Um shard fechado por falta de uso (database.for_user) volta como outro objeto
+        if history is None or history.db is not db:
+            history = _histories[key] = SessionHistory(db, user_id)
+        return history
+
+
+def reset_histories(db):
+    """Descarta os históricos em memória do banco (após remoções de sessões)"""
+    with _histories_lock:
+        histories = [history for (path, _), history in _histories.items() if path == db.path]
+    for history in histories:
+        history.reset()
+
+
+def local_hours_and_weekdays(epoch):
+    """Hora do dia e dia da semana (0 = segunda) no fuso do app"""
+    if epoch.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # Mudanças de fuso acontecem em horas cheias: converte só uma vez cada
+    # hora UTC do período e indexa a tabela resultante
+    buckets = epoch // 3600
+    first = buckets.min()
+    hours_utc = np.arange(first, buckets.max() + 1) * 3600
+    local = pd.DatetimeIndex(pd.to_datetime(hours_utc, unit='s', utc=True)).tz_convert(TIMEZONE)
+    index = buckets - first
+    return local.hour.to_numpy()[index], local.weekday.to_numpy()[index]
+
+
+def streaks(days, today):
+    """Sequência atual e maior sequência de dias consecutivos com foco
+
+    ``days`` são os dias com ao menos uma sessão de trabalho completa.
+    """
+    days = np.unique(days)
+    if days.size == 0:
+        return 0, 0
+    # Cada quebra de continuidade inicia uma nova sequência
+    starts = np.flatnonzero(np.diff(days) != 1) + 1
+    lengths = np.diff(np.concatenate(([0], starts, [days.size])))
+    longest = int(lengths.max())
+    # A sequência atual vale se o último dia com foco é hoje ou ontem
+    current = int(lengths[-1]) if today - days[-1] <= 1 else 0
+    return current, longest
+
+
+def summarize(columns, today=None):
+    """Calcula todas as métricas de um conjunto de sessões"""
+    if today is None:
+        today = day_number(date_type.today())
+
+    focus = columns.is_work & columns.completed
+    abandoned = columns.is_work & ~columns.completed
+
+    hours, weekdays = local_hours_and_weekdays(columns.epoch[focus])
+    minutes = columns.duration[focus] / 60
+
+    focus_by_hour = np.bincount(hours, weights=minutes, minlength=24)
+    heatmap = np.bincount(weekdays * 24 + hours, weights=minutes,
+                          minlength=7 * 24).reshape(7, 24)
+
+    current_streak, longest_streak = streaks(columns.day[focus], today)
+
+    completed_count = int(focus.sum())
+    abandoned_count = int(abandoned.sum())
+    started_count = completed_count + abandoned_count
+
+    return {
+        'sessions': len(columns),
+        'completed': completed_count,
+        'abandoned': abandoned_count,
+        'focus_minutes': float(minutes.sum()),
+        'focus_by_hour': focus_by_hour,
+        'weekday_heatmap': heatmap,
+        'current_streak': current_streak,
+        'longest_streak': longest_streak,
+        'completion_rate': completed_count / started_count if started_count else 0.0,
+        'abandon_ratio': abandoned_count / completed_count if completed_count else 0.0,
+    }
+
+
+def report(db, days, user_id=DEFAULT_USER):
+    """Métricas dos últimos ``days`` dias, reaproveitadas até a próxima escrita"""
+    end = date_type.today()
+    start = end - timedelta(days=days - 1)
+    start, end = start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+    db.check_external_writes()
+    return db.cache.get(('analytics', user_id, start, end),
+                        lambda: summarize(get_history(db, user_id).window(start, end)))
@@ -0,0 +1,6 @@
+"""Benchmarks e medições de desempenho do Pomodoro Timer Pro
+
+Execute a partir da raiz do repositório, por exemplo::
+
+    python -m benchmarks.chart_payload
+"""
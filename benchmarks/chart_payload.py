@@ -0,0 +1,126 @@
+"""Mede o custo do gráfico de progresso por rerun
+
+Compara a figura semanal montada a cada rerun (como era feito, com o
+template padrão do plotly) com a figura memoizada, mede os bytes enviados
+ao navegador em reruns reais do app sob o ``AppTest`` e, para cada período
+e visualização, o tamanho do gráfico e o tempo do rerun com ``--days`` dias
+de histórico (limitados pela reamostragem e pelo LTTB).
+
+    python -m benchmarks.chart_payload [--reruns 20] [--days 1095]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import harness
+
+
+def seed_history(db, days):
+    """Grava ``days`` dias de sessões completadas"""
+    import database
+
+    today = datetime.now()
+    rows = []
+    for offset in range(days):
+        date = (today - timedelta(days=offset)).strftime('%Y-%m-%d')
+        rows += [(database.DEFAULT_USER, date, 'work', 25 * 60, True)] * (4 + offset % 3)
+        rows += [(database.DEFAULT_USER, date, 'break', 5 * 60, True)] * (3 + offset % 2)
+    db.insert_sessions(rows)
+
+
+def legacy_figure(data):
+    """Figura como era montada antes do cache (com o template do plotly)"""
+    import pandas as pd
+    import plotly.express as px
+
+    df = pd.DataFrame(data, columns=['date', 'session_type', 'count'])
+    fig = px.bar(df, x='date', y='count', color='session_type',
+                 title='📈 Sessões Completadas nos Últimos 7 Dias',
+                 labels={'count': 'Número de Sessões', 'date': 'Data'},
+                 color_discrete_map={'work': '#e74c3c', 'break': '#3498db'})
+    fig.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                      font=dict(size=12), showlegend=True)
+    return fig
+
+
+def timed(func, repeat):
+    """Mediana em milissegundos de ``repeat`` execuções"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reruns', type=int, default=20)
+    parser.add_argument('--days', type=int, default=1095, help="dias de histórico")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='pomodoro-bench-')
+    harness.use_database(os.path.join(workdir, 'pomodoro_stats.db'))
+
+    import plotly.io as pio
+
+    import charts
+    import database
+    from PomodoroApp import PROGRESS_PERIODS, PROGRESS_VIEWS
+
+    db = database.get_database()
+    seed_history(db, args.days)
+
+    app = harness.bare_app()
+    today = datetime.now()
+    week = ((today - timedelta(days=6)).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))
+    data = charts.resample(app.get_progress_stats(*week), 'day')
+
+    results = {
+        'legacy_build_ms': timed(lambda: legacy_figure(data), 5),
+        'legacy_spec_bytes': len(pio.to_json(legacy_figure(data), validate=False)),
+        'build_ms': timed(lambda: app.build_progress_figure(data), 5),
+        'cached_build_ms': timed(
+            lambda: db.cache.get(('progress_chart', 'day', data),
+                                 lambda: app.build_progress_figure(data)), 50),
+        'spec_bytes': len(pio.to_json(app.build_progress_figure(data), validate=False)),
+    }
+
+    recorder = harness.PayloadRecorder()
+    at = harness.new_app()
+    with harness.no_auto_rerun(), recorder.recording():
+        for _ in range(args.reruns):
+            at.run()
+    # O primeiro rerun inclui o estado inicial da sessão
+    steady = recorder.runs[1:] or recorder.runs
+    results['rerun_bytes'] = statistics.median(run['bytes'] for run in steady)
+    results['rerun_plotly_bytes'] = statistics.median(run['plotly_bytes'] for run in steady)
+
+    # Cada período e visualização: o primeiro rerun monta a figura, os
+    # seguintes a reaproveitam do cache
+    results['periods'] = {}
+    with harness.no_auto_rerun():
+        for period in PROGRESS_PERIODS:
+            for view in PROGRESS_VIEWS:
+                at.selectbox(key='progress_period').set_value(period)
+                at.radio(key='progress_view').set_value(view)
+                with recorder.recording():
+                    started = time.perf_counter()
+                    at.run()
+                    first_ms = (time.perf_counter() - started) * 1000
+                    rerun_ms = timed(at.run, 3)
+                results['periods'][f'{period} / {view}'] = {
+                    'plotly_bytes': recorder.runs[-1]['plotly_bytes'],
+                    'first_rerun_ms': first_ms,
+                    'rerun_ms': rerun_ms,
+                }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
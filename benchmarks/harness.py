@@ -0,0 +1,107 @@
+"""Execução do app sob o ``AppTest`` do Streamlit para medições
+
+Os botões do app terminam com ``st.rerun()``, e o ``AppTest`` sempre roda o
+script inteiro (não há reruns de fragmento); ``no_auto_rerun()`` desativa
+``st.rerun()`` e ``time.sleep()`` para que cada ``run()`` medido seja
+exatamente um rerun.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'PomodoroApp.py')
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def use_database(path):
+    """Aponta o app para outro banco; deve ser chamado antes de importar ``database``"""
+    if 'database' in sys.modules:
+        raise RuntimeError("use_database() precisa rodar antes de importar o módulo database")
+    os.environ['POMODORO_DB'] = path
+
+
+@contextmanager
+def no_auto_rerun():
+    """Desativa ``st.rerun()`` e ``time.sleep()`` durante a execução do app"""
+    import streamlit as st
+
+    original_rerun, original_sleep = st.rerun, time.sleep
+    st.rerun = lambda *args, **kwargs: None
+    time.sleep = lambda seconds: None
+    try:
+        yield
+    finally:
+        st.rerun, time.sleep = original_rerun, original_sleep
+
+
+class PayloadRecorder:
+    """Mede os bytes de ``ForwardMsg`` produzidos em cada rerun do ``AppTest``"""
+
+    def __init__(self):
+        self.runs = []
+
+    @contextmanager
+    def recording(self):
+        from streamlit.testing.v1 import local_script_runner
+
+        original = local_script_runner.parse_tree_from_messages
+
+        def parse(messages):
+            elements = [message for message in messages
+                        if message.WhichOneof('type') == 'delta'
+                        and message.delta.WhichOneof('type') == 'new_element']
+            components = {}
+            for message in elements:
+                element = message.delta.new_element
+                if element.WhichOneof('type') == 'component_instance':
+                    name = element.component_instance.component_name
+                    components[name] = components.get(name, 0) + message.ByteSize()
+            self.runs.append({
+                'messages': len(messages),
+                'bytes': sum(message.ByteSize() for message in messages),
+                'plotly_bytes': sum(
+                    len(message.delta.new_element.plotly_chart.spec)
+                    for message in elements
+                    if message.delta.new_element.WhichOneof('type') == 'plotly_chart'
+                ),
+                'component_bytes': components,
+                # <style>/<script> enviados dentro de st.markdown
+                'inline_assets': sum(
+                    1 for message in elements
+                    if message.delta.new_element.WhichOneof('type') == 'markdown'
+                    and ('<style' in message.delta.new_element.markdown.body
+                         or '<script' in message.delta.new_element.markdown.body)
+                ),
+            })
+            return original(messages)
+
+        local_script_runner.parse_tree_from_messages = parse
+        try:
+            yield self
+        finally:
+            local_script_runner.parse_tree_from_messages = original
+
+
+def bare_app(user_id=None):
+    """``PomodoroApp`` sem sessão do Streamlit, para chamar consultas e gráficos
+
+    Nenhum rerun acontece: só o usuário é definido; o banco é o dele
+    (``database.for_user``).
+    """
+    import database
+    from PomodoroApp import PomodoroApp
+
+    app = PomodoroApp.__new__(PomodoroApp)
+    app.user_id = user_id or database.DEFAULT_USER
+    return app
+
+
+def new_app(timeout=30):
+    """Cria um ``AppTest`` para o ``PomodoroApp.py``"""
+    from streamlit.testing.v1 import AppTest
+
+    return AppTest.from_file(APP_PATH, default_timeout=timeout)
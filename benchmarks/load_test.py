@@ -0,0 +1,550 @@
+"""Teste de carga com sessões simultâneas do navegador
+
+Sobe o ``PomodoroApp.py`` num ``streamlit run`` local e abre N sessões por
+websocket, cada uma fazendo o papel do frontend: pede o rerun inicial,
+repete os fragmentos com ``run_every`` no intervalo recebido do servidor
+(o relógio), avisa quando a aba fica escondida e clica nos botões do timer.
+Cada sessão é de um usuário diferente (``?user=``) e segue um perfil:
+
+- ``running``: inicia o timer e, de tempos em tempos, pausa e retoma, para
+  e reinicia ou reseta e reinicia;
+- ``paused``: inicia e pausa; de tempos em tempos retoma e pausa de novo;
+- ``idle``: timer parado, às vezes um reset; parte delas (``--hidden``)
+  fica com a aba escondida.
+
+Para cada N, num servidor novo, mede durante ``--duration`` segundos:
+
+- CPU do processo do servidor (% de um núcleo, via ``/proc``) e memória
+  (RSS) por sessão, descontada a memória do servidor já aquecido;
+- latência dos reruns vista pelo cliente (p50, p95, p99), por tipo de rerun;
+- espera pelos locks do banco e duração dos reruns completos, lidas do
+  ``/metrics`` do servidor (``POMODORO_PROFILE=1``).
+
+A curva de capacidade é a tabela por N; a capacidade é o maior N com p95
+dos cliques abaixo de ``--slo-ms``, sem erros e com CPU abaixo de 90%.
+Tudo roda localmente (Linux), sem rede externa::
+
+    python -m benchmarks.load_test --sessions 10 50 100 200 --duration 60 \\
+        --output carga.json --plot carga.html
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks import harness, synthetic
+
+DEFAULT_SESSIONS = (10, 25, 50, 100)
+DEFAULT_MIX = 'running=0.3,paused=0.2,idle=0.5'
+PROFILES = ('running', 'paused', 'idle')
+RERUN_TIMEOUT = 30.0
+CPU_LIMIT = 90.0
+
+START = '▶️ INICIAR'
+PAUSE = ('⏸️ PAUSAR', '▶️ CONTINUAR')
+STOP = '⏹️ PARAR'
+RESET = '🔄 RESET'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def parse_mix(text):
+    """``running=0.3,paused=0.2,idle=0.5`` em pesos por perfil"""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name not in PROFILES:
+            raise SystemExit(f"perfil desconhecido: {name!r} (use {', '.join(PROFILES)})")
+        mix[name] = float(weight)
+    return mix
+
+
+def percentiles(samples):
+    """p50, p95 e p99 em milissegundos de durações em segundos"""
+    if not samples:
+        return None
+    samples = sorted(samples)
+
+    def at(fraction):
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+    return {'count': len(samples), 'p50_ms': at(0.50), 'p95_ms': at(0.95), 'p99_ms': at(0.99)}
+
+
+# Processo do servidor (/proc, Linux)
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as file:
+        fields = file.read().rsplit(')', 1)[1].split()
+    # utime e stime são os campos 14 e 15 do stat (11 e 12 depois do nome)
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def rss_bytes(pid):
+    with open(f'/proc/{pid}/status') as file:
+        for line in file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class Server:
+    """``streamlit run PomodoroApp.py`` num diretório temporário"""
+
+    def __init__(self, db_path):
+        self.port = free_port()
+        self.metrics_port = free_port()
+        env = dict(os.environ, POMODORO_DB=db_path, POMODORO_PROFILE='1',
+                   POMODORO_METRICS_PORT=str(self.metrics_port),
+                   POMODORO_MAINTENANCE_INTERVAL='0')
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', harness.APP_PATH,
+             '--server.port', str(self.port), '--server.headless', 'true',
+             '--server.enableXsrfProtection', 'false', '--server.fileWatcherType', 'none',
+             '--browser.gatherUsageStats', 'false'],
+            cwd=harness.ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        self.url = f'ws://127.0.0.1:{self.port}/_stcore/stream'
+
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{self.port}/_stcore/health', timeout=1)
+                return
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+        self.log.seek(0)
+        raise RuntimeError("o servidor não subiu:\n" + self.log.read().decode(errors='replace'))
+
+    def metrics(self):
+        """Histogramas do ``/metrics``: ``{(nome, rótulos): {'buckets', 'sum', 'count'}}``"""
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{self.metrics_port}/metrics',
+                                        timeout=5) as response:
+                text = response.read().decode()
+        except (urllib.error.URLError, ConnectionError):
+            return {}
+        return parse_histograms(text)
+
+    def cpu_seconds(self):
+        return cpu_seconds(self.process.pid)
+
+    def rss_bytes(self):
+        return rss_bytes(self.process.pid)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+def parse_histograms(text):
+    histograms = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        name, _, labels = series.partition('{')
+        labels = dict(item.split('=', 1) for item in labels.rstrip('}').split(',') if item)
+        labels = {key: value.strip('"') for key, value in labels.items()}
+        le = labels.pop('le', None)
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix):
+                base = name[:-len(suffix)]
+                break
+        else:
+            continue
+        entry = histograms.setdefault((base, tuple(sorted(labels.items()))),
+                                      {'buckets': {}, 'sum': 0.0, 'count': 0})
+        if suffix == '_bucket':
+            entry['buckets'][float(le)] = float(value)
+        elif suffix == '_sum':
+            entry['sum'] = float(value)
+        else:
+            entry['count'] = int(float(value))
+    return histograms
+
+
+def histogram_delta(before, after, name, **labels):
+    """Observações de um histograma entre duas leituras do ``/metrics``"""
+    key = (name, tuple(sorted(labels.items())))
+    end = after.get(key)
+    if end is None:
+        return None
+    start = before.get(key, {'buckets': {}, 'sum': 0.0, 'count': 0})
+    count = end['count'] - start['count']
+    buckets = {bound: value - start['buckets'].get(bound, 0)
+               for bound, value in sorted(end['buckets'].items())}
+    return {'count': count, 'sum': end['sum'] - start['sum'], 'buckets': buckets}
+
+
+def histogram_summary(delta):
+    """Média e p95 aproximado (limite do bucket) em milissegundos"""
+    if not delta or not delta['count']:
+        return None
+    count = delta['count']
+    p95 = next((bound for bound, value in delta['buckets'].items()
+                if value >= count * 0.95), float('inf'))
+    # Fração das esperas acima de 1 ms (disputa de verdade, não só o custo do lock)
+    under_1ms = max((value for bound, value in delta['buckets'].items() if bound <= 0.001),
+                    default=0)
+    return {'count': count, 'mean_ms': delta['sum'] / count * 1000, 'p95_ms': p95 * 1000,
+            'over_1ms': 1 - under_1ms / count}
+
+
+# Sessões simuladas
+
+class Session:
+    """Uma aba do navegador: o protocolo do frontend reduzido ao necessário"""
+
+    def __init__(self, url, user_id, profile, hidden, think, rng, stats):
+        self.url = url
+        self.user_id = user_id
+        self.profile = profile
+        self.hidden = hidden
+        self.think = think
+        self.rng = rng
+        self.stats = stats
+        self.buttons = {}
+        self.auto_reruns = {}
+        self.widgets = {}
+        self.assets_id = None
+        self.assets_fragment = ''
+        self.waiting = None
+        self.ws = None
+
+    async def rerun(self, kind, fragment_id='', auto=False, trigger=None):
+        """Pede um rerun e espera ele (e os ``st.rerun()`` que ele causar) terminar"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        message = BackMsg()
+        state = message.rerun_script
+        state.query_string = f'user={self.user_id}'
+        state.fragment_id = fragment_id
+        state.is_auto_rerun = auto
+        for widget_id, value in self.widgets.items():
+            widget = state.widget_states.widgets.add()
+            widget.id = widget_id
+            widget.json_value = json.dumps(value)
+        if trigger is not None:
+            widget = state.widget_states.widgets.add()
+            widget.id = trigger
+            widget.trigger_value = True
+
+        self.waiting = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        await self.ws.send(message.SerializeToString())
+        try:
+            await asyncio.wait_for(self.waiting, RERUN_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            return
+        finally:
+            self.waiting = None
+        self.stats.latency(kind, time.perf_counter() - started)
+
+    async def receive(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        finished = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+        async for data in self.ws:
+            message = ForwardMsg()
+            message.ParseFromString(data)
+            kind = message.WhichOneof('type')
+            if kind == 'new_session':
+                if not message.new_session.fragment_ids_this_run:
+                    # Como o frontend: um rerun completo registra de novo os run_every
+                    self.auto_reruns.clear()
+            elif kind == 'auto_rerun':
+                self.auto_reruns[message.auto_rerun.fragment_id] = [
+                    message.auto_rerun.interval, time.monotonic() + message.auto_rerun.interval]
+            elif kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+                self.element(message.delta)
+            elif kind == 'script_finished':
+                if message.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.stats.errors += 1
+                if message.script_finished in finished and self.waiting and not self.waiting.done():
+                    self.waiting.set_result(None)
+
+    def element(self, delta):
+        element = delta.new_element
+        kind = element.WhichOneof('type')
+        if kind == 'button':
+            self.buttons[element.button.label] = (element.button.id, delta.fragment_id)
+        elif kind == 'component_instance' and element.component_instance.component_name.endswith('assets'):
+            self.assets_id = element.component_instance.id
+            self.assets_fragment = delta.fragment_id
+        elif kind == 'exception':
+            self.stats.errors += 1
+
+    async def click(self, *labels):
+        for label in labels:
+            if label in self.buttons:
+                widget_id, fragment_id = self.buttons[label]
+                await self.rerun('click', fragment_id, trigger=widget_id)
+                return
+
+    async def action(self):
+        """Uma interação do perfil da sessão"""
+        rng = self.rng
+        if self.profile == 'running':
+            first, second = rng.choices([(PAUSE, PAUSE), ((STOP,), (START,)), ((RESET,), (START,))],
+                                        weights=(0.6, 0.25, 0.15))[0]
+        elif self.profile == 'paused':
+            first, second = PAUSE, PAUSE
+        else:
+            if rng.random() < 0.3:
+                await self.click(RESET)
+            return
+        await self.click(*first)
+        await asyncio.sleep(rng.uniform(1, 3))
+        await self.click(*second)
+
+    async def run(self, stop_at):
+        import websockets
+
+        async with websockets.connect(self.url, subprotocols=['streamlit'], max_size=None) as ws:
+            self.ws = ws
+            receiver = asyncio.create_task(self.receive())
+            try:
+                await self.rerun('load')
+                if self.profile in ('running', 'paused'):
+                    await self.click(START)
+                if self.profile == 'paused':
+                    await self.click(*PAUSE)
+                if self.hidden and self.assets_id:
+                    self.widgets[self.assets_id] = {'visible': False}
+                    await self.rerun('visibility', self.assets_fragment)
+
+                next_action = time.monotonic() + self.rng.expovariate(1 / self.think)
+                while time.monotonic() < stop_at:
+                    now = time.monotonic()
+                    due = min([next_action, stop_at] + [due for _, due in self.auto_reruns.values()])
+                    if due > now:
+                        await asyncio.sleep(due - now)
+                        continue
+                    ticks = [fragment_id for fragment_id, (_, due) in self.auto_reruns.items()
+                             if due <= now]
+                    if ticks:
+                        fragment_id = ticks[0]
+                        interval = self.auto_reruns[fragment_id][0]
+                        self.auto_reruns[fragment_id][1] = now + interval
+                        await self.rerun('auto', fragment_id, auto=True)
+                    elif now >= next_action:
+                        next_action = now + self.rng.expovariate(1 / self.think)
+                        if not self.hidden:
+                            await self.action()
+            finally:
+                receiver.cancel()
+
+
+class Stats:
+    """Latências e falhas das sessões; só conta dentro da janela de medição"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = 0
+        self.timeouts = 0
+        self.measuring = False
+
+    def latency(self, kind, seconds):
+        if self.measuring:
+            self.samples.setdefault(kind, []).append(seconds)
+
+    def reset(self):
+        self.samples.clear()
+        self.errors = self.timeouts = 0
+        self.measuring = True
+
+
+async def drive(url, sessions, mix, hidden, think, ramp, duration, seed, on_window):
+    rng = random.Random(seed)
+    stats = Stats()
+    profiles = rng.choices(list(mix), weights=list(mix.values()), k=sessions)
+    users = synthetic.user_names(sessions)
+    loop = asyncio.get_running_loop()
+    stop_at = time.monotonic() + ramp + duration
+
+    tasks = []
+    for index, (user_id, profile) in enumerate(zip(users, profiles)):
+        session = Session(url, user_id, profile, profile == 'idle' and rng.random() < hidden,
+                          think, random.Random(seed + index), stats)
+        tasks.append(loop.create_task(session.run(stop_at)))
+        await asyncio.sleep(ramp / sessions)
+
+    # Janela de medição: depois que todas as sessões entraram
+    await asyncio.sleep(max(0.0, stop_at - duration - time.monotonic()))
+    stats.reset()
+    window = on_window()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    stats.measuring = False
+    failures = [result for result in results if isinstance(result, BaseException)]
+    return stats, window, failures, profiles
+
+
+def measure(sessions, args):
+    """Um ponto da curva: servidor novo, aquecido, com ``sessions`` sessões"""
+    workdir = tempfile.mkdtemp(prefix='pomodoro-load-')
+    db_path = os.path.join(workdir, 'pomodoro_stats.db')
+    if args.rows:
+        synthetic.generate(db_path, args.rows, user_ids=synthetic.user_names(sessions))
+    server = Server(db_path)
+    try:
+        server.wait_ready()
+        # Aquece o servidor (imports de pandas/plotly, banco aberto) antes da linha de base
+        asyncio.run(drive(server.url, 1, {'idle': 1}, 0, args.think, 0, 2, args.seed,
+                          lambda: None))
+        time.sleep(1)
+        baseline_rss = server.rss_bytes()
+
+        window = {}
+
+        def on_window():
+            window['metrics'] = server.metrics()
+            window['cpu'] = server.cpu_seconds()
+            window['client_cpu'] = sum(os.times()[:2])
+            window['started'] = time.monotonic()
+
+        stats, _, failures, profiles = asyncio.run(drive(
+            server.url, sessions, args.mix, args.hidden, args.think, args.ramp,
+            args.duration, args.seed, on_window))
+        elapsed = time.monotonic() - window['started']
+        cpu = (server.cpu_seconds() - window['cpu']) / elapsed * 100
+        client_cpu = (sum(os.times()[:2]) - window['client_cpu']) / elapsed * 100
+        rss = server.rss_bytes()
+        metrics = server.metrics()
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latency = {kind: percentiles(samples) for kind, samples in sorted(stats.samples.items())}
+    reruns = sum(len(samples) for samples in stats.samples.values())
+    return {
+        'sessions': sessions,
+        'profiles': {name: profiles.count(name) for name in PROFILES},
+        'duration_s': elapsed,
+        'reruns_per_second': reruns / elapsed,
+        'cpu_percent': cpu,
+        'client_cpu_percent': client_cpu,
+        'rss_mb': rss / 2**20,
+        'rss_per_session_mb': (rss - baseline_rss) / sessions / 2**20,
+        'latency': latency,
+        'all_reruns': percentiles([sample for samples in stats.samples.values()
+                                   for sample in samples]),
+        'server_full_rerun': histogram_summary(
+            histogram_delta(window['metrics'], metrics, 'pomodoro_rerun_seconds', kind='full')),
+        'server_fragment_rerun': histogram_summary(
+            histogram_delta(window['metrics'], metrics, 'pomodoro_rerun_seconds',
+                            kind='fragment')),
+        'lock_wait': {
+            lock: histogram_summary(histogram_delta(window['metrics'], metrics,
+                                                    'pomodoro_db_lock_wait_seconds', lock=lock))
+            for lock in ('reader', 'writer', 'sqlite')
+        },
+        'errors': stats.errors,
+        'timeouts': stats.timeouts,
+        'failed_sessions': len(failures),
+    }
+
+
+def within_slo(point, slo_ms):
+    clicks = point['latency'].get('click') or point['all_reruns'] or {}
+    return (clicks.get('p95_ms', float('inf')) <= slo_ms and not point['errors']
+            and not point['timeouts'] and not point['failed_sessions']
+            and point['cpu_percent'] < CPU_LIMIT)
+
+
+def print_point(point):
+    all_reruns = point['all_reruns'] or {}
+    clicks = point['latency'].get('click') or {}
+    writer = point['lock_wait'].get('writer') or {}
+    print(f"{point['sessions']:>5} sessões  CPU {point['cpu_percent']:5.1f}%  "
+          f"RSS {point['rss_mb']:6.1f} MB ({point['rss_per_session_mb']:5.2f} MB/sessão)  "
+          f"{point['reruns_per_second']:6.1f} reruns/s  "
+          f"p50/p95/p99 {all_reruns.get('p50_ms', 0):6.1f}/{all_reruns.get('p95_ms', 0):6.1f}/"
+          f"{all_reruns.get('p99_ms', 0):6.1f} ms  cliques p95 {clicks.get('p95_ms', 0):6.1f} ms  "
+          f"escritor >1 ms {writer.get('over_1ms', 0):5.1%}  "
+          f"falhas {point['errors'] + point['timeouts'] + point['failed_sessions']}")
+
+
+def plot(points, path):
+    """Curva de capacidade em HTML (plotly embutido, abre sem rede)"""
+    from plotly.subplots import make_subplots
+
+    sessions = [point['sessions'] for point in points]
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True,
+                        subplot_titles=("Latência dos reruns (ms)", "CPU do servidor (%)",
+                                        "Memória do servidor (MB)"))
+    for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+        fig.add_scatter(x=sessions, y=[(point['all_reruns'] or {}).get(key) for point in points],
+                        name=key.replace('_ms', ''), row=1, col=1)
+    fig.add_scatter(x=sessions, y=[point['cpu_percent'] for point in points], name='CPU',
+                    row=2, col=1)
+    fig.add_scatter(x=sessions, y=[point['rss_mb'] for point in points], name='RSS', row=3, col=1)
+    fig.update_xaxes(title_text="Sessões simultâneas", row=3, col=1)
+    fig.update_layout(title="🍅 Capacidade de um processo do Streamlit", height=900)
+    fig.write_html(path, include_plotlyjs=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS)
+    parser.add_argument('--duration', type=float, default=30, help="segundos medidos por ponto")
+    parser.add_argument('--ramp', type=float, default=10, help="segundos para abrir as sessões")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--hidden', type=float, default=0.5,
+                        help="fração das sessões ociosas com a aba escondida")
+    parser.add_argument('--think', type=float, default=15,
+                        help="segundos médios entre interações de uma sessão")
+    parser.add_argument('--rows', type=int, default=0, help="sessões históricas no banco")
+    parser.add_argument('--slo-ms', type=float, default=500, help="p95 máximo dos cliques")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output')
+    parser.add_argument('--plot', help="grava a curva de capacidade em HTML")
+    args = parser.parse_args()
+
+    points = []
+    for sessions in args.sessions:
+        point = measure(sessions, args)
+        points.append(point)
+        print_point(point)
+
+    capacity = max((point['sessions'] for point in points if within_slo(point, args.slo_ms)),
+                   default=0)
+    print(f"Capacidade: {capacity} sessões (cliques p95 <= {args.slo_ms:g} ms, "
+          f"CPU < {CPU_LIMIT:g}%, sem falhas)")
+    if any(point['client_cpu_percent'] > CPU_LIMIT for point in points):
+        print("⚠️  o cliente de carga passou de 90% de CPU: os números do servidor podem "
+              "estar limitados pelo cliente", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'capacity': capacity, 'slo_ms': args.slo_ms, 'points': points},
+                      file, indent=2)
+            file.write('\n')
+    if args.plot:
+        plot(points, args.plot)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Teste de carga com vários usuários
+
+Mede a latência das estatísticas lidas a cada rerun (``get_today_sessions``,
+``get_daily_stats`` e ``get_progress_stats`` da semana) e do ``save_session`` enquanto o
+número de usuários cresce de 1 a 500, com a mesma concorrência e a mesma
+quantidade de sessões por usuário. Cada configuração roda num interpretador
+novo, nos dois modos de armazenamento: ``column`` (todos no mesmo banco,
+separados por ``user_id``) e ``shard`` (um banco por usuário)::
+
+    python -m benchmarks.multi_user --users 1 10 100 500 --output usuarios.json
+
+No modo ``shard`` cada banco aberto tem três conexões (escrita, leitura e a
+que observa commits externos), com os arquivos do WAL; acima de
+``POMODORO_SHARD_MAX_OPEN`` usuários os shards usados há mais tempo são
+fechados e reabertos sob demanda, e esse custo entra na latência medida.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import harness
+from benchmarks.run import summarize_samples
+
+DEFAULT_USERS = (1, 10, 100, 500)
+MODES = ('column', 'shard')
+
+
+def run_worker(mode, users, rows_per_user, requests, concurrency, write_ratio, seed):
+    """Gera os dados e aplica a carga (roda num interpretador novo)"""
+    workdir = tempfile.mkdtemp(prefix='pomodoro-users-')
+    if mode == 'shard':
+        os.environ['POMODORO_SHARD_DIR'] = workdir
+    harness.use_database(os.path.join(workdir, 'pomodoro_stats.db'))
+
+    import database
+    from benchmarks import synthetic
+
+    try:
+        user_ids = synthetic.user_names(users)
+        started = time.perf_counter()
+        if mode == 'shard':
+            for user_id in user_ids:
+                synthetic.generate(database.shard_path(user_id), rows_per_user, seed=seed,
+                                   user_ids=(user_id,))
+        else:
+            synthetic.generate(database.DEFAULT_PATH, rows_per_user * users, seed=seed,
+                               user_ids=user_ids)
+        generated = time.perf_counter() - started
+
+        apps = {user_id: harness.bare_app(user_id) for user_id in user_ids}
+
+        today = datetime.now()
+        week = ((today - timedelta(days=6)).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))
+        reads, writes = [], []
+        lock = threading.Lock()
+
+        def client(index):
+            rng = random.Random(seed + index)
+            local_reads, local_writes = [], []
+            for _ in range(requests // concurrency):
+                app = apps[rng.choice(user_ids)]
+                began = time.perf_counter()
+                if rng.random() < write_ratio:
+                    app.save_session('work', 25 * 60, True)
+                    local_writes.append(time.perf_counter() - began)
+                else:
+                    app.get_today_sessions()
+                    app.get_daily_stats()
+                    app.get_progress_stats(*week)
+                    local_reads.append(time.perf_counter() - began)
+            with lock:
+                reads.extend(local_reads)
+                writes.extend(local_writes)
+
+        threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'mode': mode,
+            'users': users,
+            'rows': rows_per_user * users,
+            'generate_seconds': generated,
+            'requests_per_second': (len(reads) + len(writes)) / elapsed,
+            'stats': summarize_samples(reads),
+            'save_session': summarize_samples(writes) if writes else None,
+        }
+    finally:
+        database._close_databases()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=DEFAULT_USERS)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--rows-per-user', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--write-ratio', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output')
+    parser.add_argument('--worker', nargs=2, metavar=('MODO', 'USUARIOS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    load = (args.rows_per_user, args.requests, args.concurrency, args.write_ratio, args.seed)
+    if args.worker:
+        mode, users = args.worker
+        print(json.dumps(run_worker(mode, int(users), *load)))
+        return 0
+
+    results = []
+    for mode in args.modes:
+        for users in args.users:
+            result = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.multi_user', '--worker', mode, str(users),
+                 '--rows-per-user', str(args.rows_per_user), '--requests', str(args.requests),
+                 '--concurrency', str(args.concurrency), '--write-ratio', str(args.write_ratio),
+                 '--seed', str(args.seed)],
+                cwd=harness.ROOT, capture_output=True, text=True, check=True)
+            report = json.loads(result.stdout.strip().splitlines()[-1])
+            results.append(report)
+            stats, save = report['stats'], report['save_session'] or {}
+            print(f"{mode:<7} {users:>5} usuários  estatísticas p50 {stats['median_ms']:7.3f} ms"
+                  f"  p95 {stats['p95_ms']:7.3f} ms  save_session p95 {save.get('p95_ms', 0):7.3f} ms"
+                  f"  {report['requests_per_second']:8.0f} req/s")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+            file.write('\n')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
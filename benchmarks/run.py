@@ -0,0 +1,200 @@
+"""Suíte de benchmarks sobre históricos sintéticos
+
+Para cada tamanho de histórico, gera (ou reaproveita) um banco sintético e,
+num interpretador novo, mede isoladamente ``get_today_sessions``,
+``get_daily_stats``, ``get_progress_stats`` (7 dias), ``save_session`` e
+``create_progress_chart`` (7 dias e todo o histórico, com o cache frio e
+quente) e um rerun completo do
+``PomodoroApp.run()`` sob o ``AppTest``. O resultado é gravado em JSON para
+comparar commits::
+
+    python -m benchmarks.run --sizes 10000 1000000 --output depois.json
+    python -m benchmarks.run --compare antes.json depois.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import harness
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+REGRESSION_THRESHOLD = 1.2
+
+
+def summarize_samples(samples):
+    """Resumo em milissegundos de uma lista de durações em segundos"""
+    samples = sorted(sample * 1000 for sample in samples)
+    return {
+        'runs': len(samples),
+        'min_ms': samples[0],
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def measure(func, repeat, setup=None):
+    """Cronometra ``func`` ``repeat`` vezes, chamando ``setup`` antes de cada uma"""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize_samples(samples)
+
+
+def run_worker(path, repeat, reruns):
+    """Mede tudo contra o banco em ``path`` (roda num interpretador novo)"""
+    harness.use_database(path)
+
+    import database
+
+    db = database.get_database()
+    app = harness.bare_app()
+    cold = db.cache.invalidate
+
+    end = datetime.now()
+    week = ((end - timedelta(days=6)).strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+    funcs = {
+        'get_today_sessions': app.get_today_sessions,
+        'get_daily_stats': app.get_daily_stats,
+        'get_progress_stats': lambda: app.get_progress_stats(*week),
+        'create_progress_chart': app.create_progress_chart,
+        'create_progress_chart.all': lambda: app.create_progress_chart(None),
+        'create_progress_chart.all_line': lambda: app.create_progress_chart(None, view='line'),
+    }
+
+    results = {}
+    for name, func in funcs.items():
+        results[name + '.cold'] = measure(func, repeat, setup=cold)
+        results[name + '.warm'] = measure(func, repeat)
+    results['save_session'] = measure(lambda: app.save_session('work', 25 * 60, True), repeat)
+
+    at = harness.new_app()
+    with harness.no_auto_rerun():
+        at.run()
+        results['app_rerun.warm'] = measure(at.run, reruns)
+        results['app_rerun.cold'] = measure(at.run, reruns, setup=cold)
+        errors = len(at.exception)
+    if errors:
+        results['app_errors'] = errors
+    return results
+
+
+def dataset(data_dir, size, seed):
+    """Caminho de um banco sintético com ``size`` sessões, gerando se preciso"""
+    from benchmarks import synthetic
+
+    path = os.path.join(data_dir, f'sessions-{size}-{seed}.db')
+    if not os.path.exists(path):
+        synthetic.generate(path, size, seed=seed)
+    return path
+
+
+def copy_database(source, target):
+    """Copia um banco SQLite, incluindo o que ainda estiver no WAL"""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+    src.close()
+    dst.close()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=harness.ROOT, text=True,
+                              capture_output=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': {},
+    }
+    for size in args.sizes:
+        source = dataset(args.data_dir, size, args.seed)
+        # Cada execução grava sessões: trabalha numa cópia do banco gerado
+        scratch = tempfile.mkdtemp(prefix='pomodoro-bench-')
+        path = os.path.join(scratch, 'pomodoro_stats.db')
+        copy_database(source, path)
+        try:
+            result = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.run', '--worker', path,
+                 '--repeat', str(args.repeat), '--reruns', str(args.reruns)],
+                cwd=harness.ROOT, capture_output=True, text=True, check=True)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        report['sizes'][str(size)] = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"✅ {size} sessões", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+def compare(before_path, after_path, threshold):
+    """Compara as medianas de dois relatórios; retorna 1 se houver regressão"""
+    with open(before_path) as file:
+        before = json.load(file)
+    with open(after_path) as file:
+        after = json.load(file)
+
+    regressions = 0
+    for size, metrics in after['sizes'].items():
+        for name, stats in metrics.items():
+            if not isinstance(stats, dict) or name not in before['sizes'].get(size, {}):
+                continue
+            old = before['sizes'][size][name]['median_ms']
+            new = stats['median_ms']
+            ratio = new / old if old else float('inf')
+            flag = ''
+            if ratio > threshold:
+                flag = '  ❌ regressão'
+                regressions += 1
+            print(f"{size:>10} {name:<28} {old:10.3f} ms -> {new:10.3f} ms  x{ratio:.2f}{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--reruns', type=int, default=10)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(),
+                                                           'pomodoro-bench-data'))
+    parser.add_argument('--output')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DEPOIS'))
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.repeat, args.reruns)))
+        return 0
+    run_suite(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
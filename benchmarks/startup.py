@@ -0,0 +1,124 @@
+"""Verifica o orçamento de tempo de inicialização do app
+
+Cada medição roda num interpretador novo, para simular o cold start de um
+worker do Streamlit:
+
+- ``import``: tempo para importar os módulos do app depois do streamlit,
+  que não pode puxar pandas nem plotly.express;
+- ``first_render``: primeiro rerun completo sob o ``AppTest`` com um banco
+  vazio, em que só o timer e os controles são desenhados, menos o primeiro
+  rerun de um script mínimo (``BARE_SCRIPT``) sob o mesmo ``AppTest``: o
+  orçamento vale para o tempo do app, não para o do Streamlit e do harness.
+
+Cada medição é a mediana de ``--repeat`` interpretadores. O primeiro render
+do app leva de 500 a 750 ms além do script mínimo (pyarrow, que o Streamlit
+importa para os componentes customizados, é quase metade disso); o orçamento
+padrão deixa uns 30% de folga sobre a pior mediana medida.
+
+Sai com código 1 se algum orçamento for estourado.
+
+    python -m benchmarks.startup [--import-budget-ms 150] [--render-budget-ms 1000]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.harness import ROOT
+
+# NumPy não entra na lista: o próprio Streamlit importa pyarrow (e com ele
+# NumPy) ao renderizar qualquer componente customizado
+HEAVY_MODULES = ('pandas', 'plotly.express')
+
+IMPORT_PROBE = '''
+import json, sys, time
+import streamlit
+started = time.perf_counter()
+import database, timer_engine, widgets
+elapsed = time.perf_counter() - started
+print(json.dumps({"ms": elapsed * 1000,
+                  "heavy": [m for m in %(heavy)r if m in sys.modules]}))
+'''
+
+# Só o que qualquer app paga no primeiro rerun: Streamlit, sessão e harness
+BARE_SCRIPT = '''
+import streamlit as st
+st.set_page_config(page_title="startup")
+st.markdown("startup")
+'''
+
+RENDER_PROBE = '''
+import json, os, sys, time
+from streamlit.testing.v1 import AppTest
+from benchmarks import harness
+harness.use_database(os.path.join(%(workdir)r, "pomodoro_stats.db"))
+at = %(app)s
+with harness.no_auto_rerun():
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+print(json.dumps({"ms": elapsed * 1000,
+                  "heavy": [m for m in %(heavy)r if m in sys.modules],
+                  "errors": len(at.exception)}))
+'''
+
+
+def probe(code):
+    """Executa ``code`` num interpretador novo e lê o JSON da última linha"""
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median_probe(code, repeat):
+    """Mediana de ``repeat`` execuções de ``code``, com os módulos pesados de todas"""
+    results = [probe(code) for _ in range(repeat)]
+    merged = dict(results[0])
+    merged['ms'] = statistics.median(result['ms'] for result in results)
+    merged['heavy'] = sorted({module for result in results for module in result['heavy']})
+    if 'errors' in merged:
+        merged['errors'] = max(result['errors'] for result in results)
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--import-budget-ms', type=float, default=150)
+    parser.add_argument('--render-budget-ms', type=float, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='pomodoro-startup-')
+    render = median_probe(RENDER_PROBE % {'heavy': HEAVY_MODULES, 'workdir': workdir,
+                                          'app': 'harness.new_app()'}, args.repeat)
+    bare = median_probe(RENDER_PROBE % {'heavy': (), 'workdir': workdir,
+                                        'app': f'AppTest.from_string({BARE_SCRIPT!r})'},
+                        args.repeat)
+    render['total_ms'] = render['ms']
+    render['baseline_ms'] = bare['ms']
+    render['ms'] = render['total_ms'] - bare['ms']
+    results = {
+        'import': median_probe(IMPORT_PROBE % {'heavy': HEAVY_MODULES}, args.repeat),
+        'first_render': render,
+    }
+    results['import']['budget_ms'] = args.import_budget_ms
+    results['first_render']['budget_ms'] = args.render_budget_ms
+    print(json.dumps(results, indent=2))
+
+    failures = []
+    for name, result in results.items():
+        if result['ms'] > result['budget_ms']:
+            failures.append(f"{name}: {result['ms']:.0f} ms > {result['budget_ms']:.0f} ms")
+        if result['heavy']:
+            failures.append(f"{name}: importou {', '.join(result['heavy'])}")
+        if result.get('errors'):
+            failures.append(f"{name}: {result['errors']} exceções no app")
+    for failure in failures:
+        print("❌", failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
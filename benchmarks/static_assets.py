@@ -0,0 +1,89 @@
+"""Verifica que CSS e sons não são reenviados a cada rerun
+
+O CSS do app e os sons ficam nos arquivos estáticos do componente
+``widgets/assets``; a cada rerun só vão os argumentos do componente. A
+verificação roda o app sob o ``AppTest`` e falha (código 1) se:
+
+- algum rerun enviar ``<style>`` ou ``<script>`` dentro de ``st.markdown``;
+- os bytes do componente por rerun não forem menores que os do bloco de CSS
+  que o app enviava antes (reconstruído a partir de ``assets/app.css``);
+- o rerun que toca o som de início não levar o evento ao componente.
+
+    python -m benchmarks.static_assets [--reruns 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+from benchmarks import harness
+
+ASSETS_COMPONENT = 'widgets.assets'
+CSS_PATH = os.path.join(harness.ROOT, 'widgets', 'assets', 'app.css')
+
+
+def legacy_css_bytes():
+    """Bytes do ``st.markdown('<style>...</style>')`` que ia em todo rerun"""
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    with open(CSS_PATH, encoding='utf-8') as file:
+        css = file.read()
+    message = ForwardMsg()
+    message.delta.new_element.markdown.body = f'<style>\n{css}</style>'
+    message.delta.new_element.markdown.allow_html = True
+    return message.ByteSize()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reruns', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='pomodoro-assets-')
+    harness.use_database(os.path.join(workdir, 'pomodoro_stats.db'))
+
+    recorder = harness.PayloadRecorder()
+    at = harness.new_app()
+    with harness.no_auto_rerun(), recorder.recording():
+        for _ in range(args.reruns):
+            at.run()
+        steady = recorder.runs[1:] or recorder.runs
+        at.button[0].click().run()  # ▶️ INICIAR pede o som de início e chama st.rerun()
+        at.run()
+        sound_run = recorder.runs[-1]
+    sound = at.session_state.sound
+
+    results = {
+        'rerun_bytes': statistics.median(run['bytes'] for run in steady),
+        'assets_bytes': statistics.median(
+            run['component_bytes'].get(ASSETS_COMPONENT, 0) for run in steady),
+        'legacy_css_bytes': legacy_css_bytes(),
+        'inline_assets': max(run['inline_assets'] for run in recorder.runs),
+        'sound': sound,
+        'sound_rerun_assets_bytes': sound_run['component_bytes'].get(ASSETS_COMPONENT, 0),
+    }
+    results['saved_bytes_per_rerun'] = results['legacy_css_bytes'] - results['assets_bytes']
+    print(json.dumps(results, indent=2))
+
+    failures = []
+    if results['inline_assets']:
+        failures.append(f"{results['inline_assets']} blocos <style>/<script> em st.markdown")
+    if not results['assets_bytes']:
+        failures.append("componente de assets não foi renderizado")
+    elif results['saved_bytes_per_rerun'] <= 0:
+        failures.append(f"componente ({results['assets_bytes']} bytes) não é menor que o CSS "
+                        f"inline ({results['legacy_css_bytes']} bytes)")
+    if (not sound or sound.get('name') != 'start'
+            or results['sound_rerun_assets_bytes'] <= results['assets_bytes']):
+        failures.append("o som de início não chegou ao componente")
+    if at.exception:
+        failures.append(f"{len(at.exception)} exceções no app")
+    for failure in failures:
+        print("❌", failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Gerador de históricos sintéticos para a tabela ``sessions``
+
+Gera de 10 mil a 10 milhões de sessões distribuídas ao longo de ``days``
+dias, com a mistura de um time real: ciclos de trabalho e pausas curtas,
+uma pausa longa a cada quatro sessões de trabalho, sessões abandonadas
+(``completed = 0``, como as gravadas pelo ``stop_timer``) com duração
+parcial e horários concentrados no expediente. As sessões podem ser
+repartidas entre vários usuários (``--users``).
+
+    python -m benchmarks.synthetic caminho.db --rows 1000000
+"""
+import argparse
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import database
+
+CHUNK_ROWS = 200_000
+WORK_SECONDS = 25 * 60
+SHORT_BREAK_SECONDS = 5 * 60
+LONG_BREAK_SECONDS = 15 * 60
+ABANDON_RATE = {'work': 0.12, 'break': 0.05}
+UTC_OFFSET_HOURS = 3  # America/Sao_Paulo
+
+
+def generate_chunk(rng, rows, first_day, days, user_ids):
+    """Gera ``rows`` sessões como tuplas prontas para o INSERT"""
+    day = np.sort(rng.integers(0, days, rows))
+    users = np.asarray(user_ids)[rng.integers(0, len(user_ids), rows)]
+    # Ciclo trabalho/pausa: posições pares são trabalho; a cada 4 trabalhos, pausa longa
+    slot = rng.integers(0, 8, rows)
+    is_work = slot % 2 == 0
+    planned = np.where(is_work, WORK_SECONDS,
+                       np.where(slot == 7, LONG_BREAK_SECONDS, SHORT_BREAK_SECONDS))
+
+    abandon_rate = np.where(is_work, ABANDON_RATE['work'], ABANDON_RATE['break'])
+    completed = rng.random(rows) >= abandon_rate
+    duration = np.where(completed, planned, (planned * rng.random(rows)).astype(np.int64))
+
+    # Horário local em torno das 14h, limitado ao intervalo 7h-22h
+    local_seconds = np.clip(rng.normal(14 * 3600, 3 * 3600, rows), 7 * 3600, 22 * 3600)
+    utc_seconds = local_seconds.astype(np.int64) + UTC_OFFSET_HOURS * 3600
+
+    day_values = np.datetime64(first_day, 'D') + day
+    dates = np.datetime_as_string(day_values, unit='D')
+    timestamps = np.datetime_as_string(
+        day_values.astype('datetime64[s]') + utc_seconds, unit='s')
+    timestamps = np.char.replace(timestamps, 'T', ' ')
+
+    session_type = np.where(is_work, 'work', 'break')
+    return zip(users.tolist(), dates.tolist(), session_type.tolist(), duration.tolist(),
+               completed.astype(int).tolist(), timestamps.tolist())
+
+
+def user_names(count):
+    """Identificadores ``user-0001`` ... dos usuários sintéticos"""
+    return [f'user-{index:04d}' for index in range(1, count + 1)]
+
+
+def generate(path, rows, days=365, seed=42, end=None, user_ids=(database.DEFAULT_USER,)):
+    """Cria (ou completa) o banco em ``path`` com ``rows`` sessões sintéticas"""
+    db = database.Database(path)
+    db.close()
+
+    end = end or date.today()
+    first_day = end - timedelta(days=days - 1)
+    rng = np.random.default_rng(seed)
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('BEGIN')
+    remaining = rows
+    # Cada bloco cobre uma fatia do período, mantendo ids em ordem cronológica
+    chunks = max(1, -(-rows // CHUNK_ROWS))
+    for index in range(chunks):
+        size = min(CHUNK_ROWS, remaining)
+        span_start = first_day + timedelta(days=days * index // chunks)
+        span_days = max(1, days * (index + 1) // chunks - days * index // chunks)
+        conn.executemany('''
+            INSERT INTO sessions (user_id, date, session_type, duration, completed, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', generate_chunk(rng, size, span_start, span_days, user_ids))
+        remaining -= size
+    conn.execute('COMMIT')
+    conn.close()
+
+    db = database.Database(path)
+    db.rebuild_rollup()
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int, default=1,
+                        help="número de usuários (user-0001, user-0002, ...)")
+    args = parser.parse_args()
+
+    user_ids = user_names(args.users) if args.users > 1 else (database.DEFAULT_USER,)
+    started = time.perf_counter()
+    generate(args.path, args.rows, args.days, args.seed, user_ids=user_ids)
+    print(f"✅ {args.rows} sessões geradas em {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
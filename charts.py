@@ -0,0 +1,121 @@
+"""Séries dos gráficos de progresso com tamanho limitado
+
+Os gráficos aceitam qualquer período, de uma semana a todo o histórico. Os
+agregados diários de ``daily_rollup`` são reamostrados no servidor em baldes
+de dia, semana (começando na segunda) ou mês: nas barras, o balde pedido
+sobe para o próximo maior até caber em ``MAX_BARS`` barras; na linha, a
+série é reduzida a ``MAX_POINTS`` pontos com LTTB (Largest-Triangle-Three-
+Buckets), que mantém os picos e vales visíveis. O spec enviado ao navegador
+e o tempo de desenho não dependem do tamanho do histórico.
+"""
+import numpy as np
+import pandas as pd
+
+BUCKETS = ('day', 'week', 'month', 'year')
+BUCKET_NAMES = {'day': 'dia', 'week': 'semana', 'month': 'mês', 'year': 'ano'}
+MAX_BARS = 60
+MAX_POINTS = 300
+
+
+def day_range(start, end):
+    """Todos os dias entre ``start`` e ``end`` (``YYYY-MM-DD``, inclusivo)"""
+    return np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+
+
+def bucket_start(days, bucket):
+    """Primeiro dia do balde de cada dia (``datetime64[D]``)"""
+    if bucket == 'day':
+        return days
+    if bucket == 'week':
+        # 1970-01-01 foi uma quinta-feira: +3 alinha as semanas na segunda
+        return days - (days.astype(np.int64) + 3) % 7
+    unit = 'M' if bucket == 'month' else 'Y'
+    return days.astype(f'datetime64[{unit}]').astype('datetime64[D]')
+
+
+def choose_bucket(start, end, bucket=None, max_bars=MAX_BARS):
+    """Menor balde, a partir de ``bucket`` (ou dia), com até ``max_bars`` barras"""
+    days = day_range(start, end)
+    candidates = BUCKETS[BUCKETS.index(bucket or 'day'):]
+    for candidate in candidates:
+        if len(np.unique(bucket_start(days, candidate))) <= max_bars:
+            return candidate
+    return candidates[-1]
+
+
+def _completed_frame(rollup, bucket):
+    """Sessões completadas do rollup, com o início do balde de cada dia"""
+    rows = [(date, session_type, count, total_duration)
+            for (date, session_type, completed), (count, total_duration) in rollup.items()
+            if completed]
+    if not rows:
+        return None
+    df = pd.DataFrame(rows, columns=['date', 'session_type', 'count', 'duration'])
+    df['bucket'] = bucket_start(df['date'].to_numpy(dtype='datetime64[D]'), bucket)
+    return df
+
+
+def resample(rollup, bucket):
+    """Sessões completadas por balde e tipo: ``((início, session_type, count), ...)``
+
+    ``rollup`` é o dicionário de ``Database.daily_rollup``.
+    """
+    df = _completed_frame(rollup, bucket)
+    if df is None:
+        return ()
+    grouped = df.groupby(['bucket', 'session_type'], sort=True)['count'].sum()
+    return tuple((str(bucket_day)[:10], session_type, int(count))
+                 for (bucket_day, session_type), count in grouped.items())
+
+
+def focus_series(rollup, start, end, bucket):
+    """Minutos de foco por balde, com zero nos baldes sem sessões
+
+    Retorna ``(inícios, minutos)``, um ponto por balde do período.
+    """
+    starts = np.unique(bucket_start(day_range(start, end), bucket))
+    minutes = np.zeros(len(starts))
+    df = _completed_frame(rollup, bucket)
+    if df is not None:
+        work = df[df['session_type'] == 'work']
+        totals = work.groupby('bucket')['duration'].sum()
+        positions = np.searchsorted(starts, totals.index.to_numpy(dtype='datetime64[D]'))
+        minutes[positions] = totals.to_numpy() / 60
+    return starts, minutes
+
+
+def lttb(x, y, threshold=MAX_POINTS):
+    """Índices dos ``threshold`` pontos mantidos pelo Largest-Triangle-Three-Buckets
+
+    O primeiro e o último ponto ficam sempre; de cada balde intermediário fica
+    o ponto que forma o maior triângulo com o ponto escolhido antes e com a
+    média do balde seguinte.
+    """
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # threshold - 2 baldes cobrindo os pontos 1 .. size - 2, nunca vazios
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, size - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_low, next_high = high, edges[bucket + 2]
+            next_x, next_y = x[next_low:next_high].mean(), y[next_low:next_high].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs((x[previous] - next_x) * (y[low:high] - y[previous])
+                       - (x[previous] - x[low:high]) * (next_y - y[previous]))
+        previous = low + int(areas.argmax())
+        indices[bucket + 1] = previous
+    return indices
+
+
+def downsample(starts, minutes, threshold=MAX_POINTS):
+    """Série de ``focus_series`` reduzida com LTTB"""
+    keep = lttb(starts.astype(np.int64), minutes, threshold)
+    return starts[keep], minutes[keep]
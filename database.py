@@ -0,0 +1,502 @@
+"""Acesso ao banco de estatísticas SQLite compartilhado pelo processo
+
+O Streamlit reexecuta o script a cada interação, então as conexões e a
+criação do schema ficam fora do caminho de cada rerun: ``get_database()``
+abre o banco uma única vez por processo, em modo WAL, com um pequeno pool de
+conexões somente leitura e uma única conexão de escrita serializada.
+
+Cada sessão pertence a um usuário (``user_id``). Por padrão todos os usuários
+ficam no mesmo arquivo, separados pela coluna e pelos índices que começam por
+ela; com ``POMODORO_SHARD_DIR`` cada usuário ganha o seu próprio arquivo
+(``for_user()``), sem disputar o escritor com os demais.
+"""
+import argparse
+import atexit
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import instrumentation
+import maintenance
+import migrations
+from query_cache import QueryCache
+from session_writer import SessionWriter
+
+DEFAULT_PATH = os.environ.get('POMODORO_DB', '../pomodoro_stats.db')
+READ_POOL_SIZE = 4
+DEFAULT_USER = 'default'
+# Um banco por usuário neste diretório (vazio: todos no DEFAULT_PATH)
+SHARD_DIR = os.environ.get('POMODORO_SHARD_DIR', '')
+SHARD_POOL_SIZE = 1  # cada shard atende um único usuário
+# Shards abertos ao mesmo tempo; os usados há mais tempo são fechados
+SHARD_MAX_OPEN = int(os.environ.get('POMODORO_SHARD_MAX_OPEN', '64'))
+# Grava sessões em segundo plano, em lotes (ver session_writer)
+WRITE_BEHIND = os.environ.get('POMODORO_WRITE_BEHIND', '') == '1'
+
+PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -8000',  # ~8 MB por conexão
+    'PRAGMA mmap_size = 67108864',  # 64 MB
+)
+
+INSERT_SESSION = '''
+    INSERT INTO sessions (user_id, date, session_type, duration, completed)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+UPDATE_ROLLUP = '''
+    INSERT INTO daily_rollup (user_id, date, session_type, completed, count, total_duration)
+    VALUES (?, ?, ?, ?, 1, ?)
+    ON CONFLICT (user_id, date, session_type, completed) DO UPDATE SET
+        count = count + 1,
+        total_duration = total_duration + excluded.total_duration
+'''
+
+SELECT_ROLLUP = '''
+    SELECT date, session_type, completed, count, total_duration
+    FROM daily_rollup
+    WHERE user_id = ? AND date >= ? AND date <= ?
+'''
+
+SELECT_LAST_SESSION_ID = '''
+    SELECT MAX(id) FROM sessions
+'''
+
+SELECT_STATS_VERSION = '''
+    SELECT version FROM stats_version
+'''
+
+SELECT_FIRST_DATE = '''
+    SELECT MIN(date) FROM daily_rollup WHERE user_id = ?
+'''
+
+
+class Database:
+    """Banco SQLite com um escritor serializado e um pool de leitores"""
+
+    def __init__(self, path=DEFAULT_PATH, pool_size=READ_POOL_SIZE, write_behind=WRITE_BEHIND):
+        self.path = os.path.abspath(path)
+        self.cache = QueryCache()
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        # Só vale para bancos novos; os antigos mudam com "compact --vacuum"
+        self._writer.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        self._writer.execute('PRAGMA journal_mode = WAL')
+
+        # Detecta commits de outras conexões (importação, serviço de timers,
+        # outros processos) para invalidar o cache deste processo
+        self._watcher = self._connect(read_only=True)
+        self._watch_lock = threading.Lock()
+        self._data_version = None
+        self._stats_version = None
+        self.setup_schema()
+
+        self._pool_size = pool_size
+        self._readers = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._readers.put(self._connect(read_only=True))
+
+        self.session_writer = SessionWriter(self) if write_behind else None
+        self.closed = False
+
+    def _connect(self, read_only=False):
+        """Abre uma conexão já configurada"""
+        if read_only:
+            uri = f"file:{quote(self.path)}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   isolation_level=None)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False,
+                                   isolation_level=None)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def setup_schema(self):
+        """Cria as tabelas e aplica migrações pendentes (uma vez por processo)"""
+        with self.writer() as conn:
+            applied = migrations.migrate(conn)
+        if applied:
+            self._writer.execute('PRAGMA optimize')
+
+    @contextmanager
+    def reader(self):
+        """Empresta uma conexão somente leitura do pool"""
+        if self.closed:
+            raise sqlite3.ProgrammingError(f"banco fechado: {self.path}")
+        started = time.perf_counter()
+        conn = self._readers.get()
+        if instrumentation.ENABLED:
+            instrumentation.lock_wait('reader', time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Executa escritas em uma única transação serializada
+
+        Com a instrumentação ativa, registra a espera pelo escritor do
+        processo e, no ``BEGIN IMMEDIATE``, por escritores de outros processos.
+        """
+        started = time.perf_counter()
+        with self._write_lock:
+            locked = time.perf_counter()
+            self._writer.execute('BEGIN IMMEDIATE')
+            if instrumentation.ENABLED:
+                instrumentation.lock_wait('writer', locked - started)
+                instrumentation.lock_wait('sqlite', time.perf_counter() - locked)
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute('ROLLBACK')
+                raise
+            # Os próprios commits são invalidados por quem escreve
+            self._stats_version = self._writer.execute(SELECT_STATS_VERSION).fetchone()[0]
+            self._writer.execute('COMMIT')
+            self._data_version = self._read_data_version()
+
+    def run_pragmas(self, script):
+        """Executa PRAGMAs de manutenção (ex.: ``VACUUM``) fora de transação"""
+        with self._write_lock:
+            self._writer.executescript(script)
+            self._data_version = self._read_data_version()
+
+    def _read_data_version(self):
+        with self._watch_lock:
+            return self._watcher.execute('PRAGMA data_version').fetchone()[0]
+
+    def data_version(self):
+        """Muda a cada commit no arquivo, de qualquer conexão ou processo"""
+        return self._read_data_version()
+
+    def check_external_writes(self):
+        """Invalida o cache se outra conexão gravou sessões desde a última verificação
+
+        ``PRAGMA data_version`` muda a cada commit de outra conexão, inclusive
+        os do ``timer_state``; só então a versão das estatísticas, mantida por
+        triggers em ``sessions`` e ``daily_rollup``, é lida para decidir.
+        """
+        version = self._read_data_version()
+        if version == self._data_version:
+            return
+        self._data_version = version
+        with self._watch_lock:
+            stats_version = self._watcher.execute(SELECT_STATS_VERSION).fetchone()[0]
+        if stats_version != self._stats_version:
+            self._stats_version = stats_version
+            self.cache.invalidate()
+
+    def fetchone(self, sql, params=()):
+        """Executa uma consulta e retorna a primeira linha"""
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        """Executa uma consulta e retorna todas as linhas"""
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def save_sessions(self, rows):
+        """Grava sessões, pela fila do escritor em segundo plano quando ativo"""
+        if self.session_writer is not None:
+            self.session_writer.submit(rows)
+        else:
+            self.insert_sessions(rows)
+
+    def insert_sessions(self, rows, on_inserted=None):
+        """Grava sessões ``(user_id, date, session_type, duration, completed)``
+
+        Os agregados de ``daily_rollup`` são atualizados na mesma transação.
+        ``on_inserted`` recebe o ``id`` da última sessão inserida antes do
+        commit, isto é, antes de outras conexões poderem vê-la.
+        """
+        rows = [(user_id, date, session_type, duration, int(completed))
+                for user_id, date, session_type, duration, completed in rows]
+        with self.writer() as conn:
+            conn.executemany(INSERT_SESSION, rows)
+            if on_inserted is not None:
+                on_inserted(conn.execute('SELECT last_insert_rowid()').fetchone()[0])
+            conn.executemany(UPDATE_ROLLUP, [
+                (user_id, date, session_type, completed, duration)
+                for user_id, date, session_type, duration, completed in rows
+            ])
+        self.cache.invalidate()
+
+    def rebuild_rollup(self):
+        """Recalcula ``daily_rollup`` a partir de ``sessions`` e dos dias arquivados"""
+        with self.writer() as conn:
+            conn.execute('DELETE FROM daily_rollup')
+            conn.execute('''
+                INSERT INTO daily_rollup
+                    (user_id, date, session_type, completed, count, total_duration)
+                SELECT user_id, date, session_type, completed, count, total_duration
+                FROM archived_rollup
+            ''')
+            conn.execute('''
+                INSERT INTO daily_rollup
+                    (user_id, date, session_type, completed, count, total_duration)
+                SELECT user_id, date, session_type, completed, COUNT(*), SUM(duration)
+                FROM sessions
+                WHERE true
+                GROUP BY user_id, date, session_type, completed
+                ON CONFLICT (user_id, date, session_type, completed) DO UPDATE SET
+                    count = count + excluded.count,
+                    total_duration = total_duration + excluded.total_duration
+            ''')
+        self.cache.invalidate()
+
+    def cached_fetchone(self, sql, params=()):
+        """Como ``fetchone``, reaproveitando o resultado até a próxima escrita"""
+        self.check_external_writes()
+        return self.cache.get(('one', sql, tuple(params)),
+                              lambda: self.fetchone(sql, params))
+
+    def cached_fetchall(self, sql, params=()):
+        """Como ``fetchall``, reaproveitando o resultado até a próxima escrita
+
+        A lista retornada é compartilhada entre reruns e não deve ser alterada.
+        """
+        self.check_external_writes()
+        return self.cache.get(('all', sql, tuple(params)),
+                              lambda: self.fetchall(sql, params))
+
+    def daily_rollup(self, start, end, user_id=DEFAULT_USER):
+        """Obtém ``{(date, session_type, completed): (count, total_duration)}`` do período
+
+        Inclui as sessões que ainda estão na fila do escritor em segundo plano.
+        O dicionário retornado é compartilhado entre reruns e não deve ser alterado.
+        """
+        self.check_external_writes()
+        writer = self.session_writer
+        if writer is None:
+            return self._cached_rollup(start, end, user_id)[1]
+
+        # O lote em gravação pode já estar no banco lido: o escritor desconta
+        # os lotes com id até last_id, lido junto com os agregados. Um lote que
+        # terminou de gravar depois da leitura já saiu do overlay sem estar
+        # nela; o commit invalida o cache antes de o lote sair do overlay,
+        # então a versão mudou e a leitura é refeita.
+        while True:
+            version = self.cache.version
+            last_id, rollup = self._cached_rollup(start, end, user_id)
+            with writer.lock:
+                if self.cache.version != version:
+                    continue
+                pending = [(key[1:], value)
+                           for key, value in writer.pending_rollup(last_id).items()
+                           if key[0] == user_id and start <= key[1] <= end]
+            break
+        if not pending:
+            return rollup
+
+        rollup = dict(rollup)
+        for key, (count, total_duration) in pending:
+            saved_count, saved_duration = rollup.get(key, (0, 0))
+            rollup[key] = (saved_count + count, saved_duration + total_duration)
+        return rollup
+
+    def _cached_rollup(self, start, end, user_id):
+        """``(último id de sessions, agregados)`` lidos no mesmo snapshot"""
+        def read():
+            with self.reader() as conn:
+                conn.execute('BEGIN')
+                try:
+                    last_id = conn.execute(SELECT_LAST_SESSION_ID).fetchone()[0] or 0
+                    rows = conn.execute(SELECT_ROLLUP, (user_id, start, end)).fetchall()
+                finally:
+                    conn.execute('COMMIT')
+            return last_id, {
+                (date, session_type, completed): (count, total_duration)
+                for date, session_type, completed, count, total_duration in rows
+            }
+
+        return self.cache.get(('rollup', user_id, start, end), read)
+
+    def first_date(self, user_id=DEFAULT_USER):
+        """Primeiro dia com sessões gravadas do usuário (``None`` se não houver)"""
+        return self.cached_fetchone(SELECT_FIRST_DATE, (user_id,))[0]
+
+    def in_use(self):
+        """Há uma leitura ou uma escrita em andamento"""
+        return self._readers.qsize() < self._pool_size or self._write_lock.locked()
+
+    def close(self):
+        """Grava as sessões pendentes e fecha todas as conexões
+
+        Espera as leituras em andamento devolverem as conexões ao pool.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.session_writer is not None:
+            self.session_writer.close()
+        for _ in range(self._pool_size):
+            self._readers.get().close()
+        with self._watch_lock:
+            self._watcher.close()
+        # A conexão de escrita fecha por último para fazer o checkpoint do WAL
+        with self._write_lock:
+            self._writer.close()
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(path=DEFAULT_PATH, pool_size=READ_POOL_SIZE):
+    """Obtém o banco compartilhado do processo, abrindo-o na primeira chamada"""
+    key = os.path.abspath(path)
+    database = _databases.get(key)
+    if database is None:
+        with _databases_lock:
+            database = _databases.get(key)
+            if database is None:
+                database = _databases[key] = Database(key, pool_size=pool_size)
+                maintenance.ensure_started(_open_databases)
+    return database
+
+
+def _open_databases():
+    with _databases_lock:
+        return list(_databases.values())
+
+
+def shard_path(user_id, shard_dir=None):
+    """Arquivo do banco de um usuário no modo com um banco por usuário
+
+    O nome mantém uma parte legível do ``user_id`` e um hash dele, para que
+    identificadores diferentes nunca caiam no mesmo arquivo.
+    """
+    readable = re.sub(r'[^A-Za-z0-9_.-]', '_', user_id)[:40]
+    digest = hashlib.sha1(user_id.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(shard_dir or SHARD_DIR, f'{readable}-{digest}.db')
+
+
+_shards_used = OrderedDict()  # caminhos dos shards abertos, do usado há mais tempo ao último
+
+
+def for_user(user_id):
+    """Obtém o banco onde ficam as sessões do usuário
+
+    No modo com um banco por usuário no máximo ``SHARD_MAX_OPEN`` shards
+    ficam abertos (cada um com as suas conexões, os arquivos do WAL e, com
+    ``POMODORO_WRITE_BEHIND``, a sua thread de escrita): abrir mais um fecha
+    os usados há mais tempo, depois de gravar as sessões pendentes. Quem
+    obtém o banco a cada uso, em vez de guardá-lo, recebe sempre um banco
+    aberto: o último obtido é o último a ser fechado, e um shard com leitura
+    ou escrita em andamento é pulado.
+    """
+    if not SHARD_DIR:
+        return get_database()
+    path = os.path.abspath(shard_path(user_id))
+    with _databases_lock:
+        database = _databases.get(path)
+        if database is not None:
+            _shards_used.move_to_end(path)
+            return database
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    database = get_database(path, pool_size=SHARD_POOL_SIZE)
+    with _databases_lock:
+        _shards_used[path] = None
+        _shards_used.move_to_end(path)
+        idle = _evict_shards()
+    for shard in idle:
+        shard.close()
+    return database
+
+
+def _evict_shards():
+    """Retira do processo os shards acima do limite; roda com ``_databases_lock``"""
+    excess = len(_shards_used) - SHARD_MAX_OPEN
+    idle = []
+    for path in list(_shards_used):
+        if excess <= 0:
+            break
+        if _databases[path].in_use():
+            continue
+        del _shards_used[path]
+        idle.append(_databases.pop(path))
+        excess -= 1
+    return idle
+
+
+@atexit.register
+def _close_databases():
+    """Garante o flush do escritor em segundo plano ao encerrar o processo"""
+    maintenance.stop()
+    with _databases_lock:
+        for database in _databases.values():
+            database.close()
+        _databases.clear()
+        _shards_used.clear()
+
+
+def main():
+    """Comandos de manutenção do banco"""
+    parser = argparse.ArgumentParser(description="Manutenção do banco de estatísticas")
+    parser.add_argument('--db', default=DEFAULT_PATH, help="caminho do banco SQLite")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('migrate', help="aplica migrações pendentes")
+    subparsers.add_parser('rebuild-rollup', help="recalcula a tabela daily_rollup")
+    compact_parser = subparsers.add_parser(
+        'compact', help="arquiva sessões antigas e devolve o espaço livre ao sistema")
+    compact_parser.add_argument('--days', type=int, default=maintenance.RETENTION_DAYS,
+                                help="dias de sessões mantidas (padrão: POMODORO_RETENTION_DAYS)")
+    compact_parser.add_argument('--vacuum', action='store_true',
+                                help="VACUUM completo, ativando o vácuo incremental")
+    for command, help_text in (('export', "exporta as sessões (csv, jsonl ou parquet)"),
+                               ('import', "importa sessões, ignorando as já existentes")):
+        subparser = subparsers.add_parser(command, help=help_text)
+        subparser.add_argument('path')
+        subparser.add_argument('--format', choices=('csv', 'jsonl', 'parquet'),
+                               help="padrão: deduzido da extensão do arquivo")
+        subparser.add_argument('--user', help="exporta só este usuário / importa para este usuário")
+    args = parser.parse_args()
+
+    if args.command == 'compact' and args.vacuum and os.path.exists(args.db):
+        try:
+            maintenance.enable_incremental_vacuum(args.db)
+        except sqlite3.OperationalError as error:
+            raise SystemExit(f"❌ VACUUM completo precisa do app parado: {error}")
+
+    db = get_database(args.db)
+    if args.command == 'rebuild-rollup':
+        db.rebuild_rollup()
+        print("✅ daily_rollup recalculada")
+    elif args.command == 'compact':
+        archived = maintenance.compact(db, args.days)
+        if maintenance.incremental_vacuum_enabled(db):
+            while maintenance.vacuum_step(db):
+                pass
+        db.run_pragmas('PRAGMA optimize;')
+        print(f"✅ {archived} sessões arquivadas; {os.path.getsize(db.path) // 1024} KB no arquivo")
+    elif args.command in ('export', 'import'):
+        import session_transfer
+
+        try:
+            if args.command == 'export':
+                count = session_transfer.export_sessions(db, args.path, args.format, args.user)
+                print(f"✅ {count} sessões exportadas para {args.path}")
+            else:
+                read, imported = session_transfer.import_sessions(db, args.path, args.format,
+                                                                  args.user)
+                print(f"✅ {imported} de {read} sessões importadas ({read - imported} já existiam)")
+        except session_transfer.TransferError as error:
+            raise SystemExit(f"❌ {error}")
+    else:
+        print("✅ Schema na versão", migrations.LATEST_VERSION)
+
+
+if __name__ == "__main__":
+    main()
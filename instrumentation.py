@@ -0,0 +1,303 @@
+"""Instrumentação opcional dos reruns (POMODORO_PROFILE=1)
+
+Quando ativada, cada rerun do app é dividido em fases cronometradas e cada
+consulta ao banco tem sua latência registrada, assim como a espera pelos
+locks do banco (pool de leitores, escritor). Os dados ficam disponíveis:
+
+- no painel de depuração do app (fases do rerun atual, consultas, cache);
+- em formato texto do Prometheus, num arquivo (POMODORO_METRICS_FILE) e/ou
+  num endpoint local (POMODORO_METRICS_PORT, em ``/metrics``), com
+  histogramas de latência do rerun, das fases, das consultas, da espera
+  pelos locks e de reruns por segundo de cada sessão, e contadores dos
+  reruns automáticos das sessões ociosas (timer parado) e do tempo que
+  elas passaram ociosas;
+- em dumps do cProfile de um rerun, pedidos pelo painel e gravados em
+  POMODORO_PROFILE_DIR.
+
+Desativada, ``current()`` devolve um perfilador nulo e ``timed_query`` não
+envolve as funções, então o custo no caminho do rerun é desprezível.
+"""
+import cProfile
+import functools
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get('POMODORO_PROFILE', '') == '1'
+METRICS_FILE = os.environ.get('POMODORO_METRICS_FILE')
+METRICS_PORT = os.environ.get('POMODORO_METRICS_PORT')
+PROFILE_DIR = os.environ.get('POMODORO_PROFILE_DIR',
+                             os.path.join(tempfile.gettempdir(), 'pomodoro-profiles'))
+METRICS_FILE_INTERVAL = 5.0  # segundos entre gravações do arquivo de métricas
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0)
+RATE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0)
+LOCK_BUCKETS = (0.00001, 0.0001) + LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+HELP = {
+    'pomodoro_rerun_seconds': 'Duração de um rerun do app (kind: full ou fragment)',
+    'pomodoro_phase_seconds': 'Duração de cada fase do rerun',
+    'pomodoro_query_seconds': 'Latência dos métodos de acesso ao banco',
+    'pomodoro_db_lock_wait_seconds': 'Espera pelo pool de leitores, pelo escritor do processo '
+                                     'e pelo lock de escrita do SQLite',
+    'pomodoro_session_reruns_per_second': 'Frequência de reruns de cada sessão do navegador',
+    'pomodoro_idle_reruns_total': 'Reruns automáticos (relógio e reagendamentos) com o timer parado',
+    'pomodoro_idle_session_seconds_total': 'Tempo somado das sessões com o timer parado',
+}
+
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histogramas e contadores do processo, indexados por nome e rótulos"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def total(self, name):
+        """Soma de um contador em todos os rótulos"""
+        with self._lock:
+            return sum(value for (metric, _), value in self._counters.items() if metric == name)
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self, name, label):
+        """``{valor do rótulo: (count, sum)}`` de uma métrica"""
+        with self._lock:
+            return {dict(labels).get(label, ''): (histogram.count, histogram.sum)
+                    for (metric, labels), histogram in self._histograms.items()
+                    if metric == name}
+
+    def render(self):
+        """Métricas no formato texto de exposição do Prometheus"""
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+        current = None
+        for (name, labels), histogram in items:
+            if name != current:
+                current = name
+                lines.append(f'# HELP {name} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} histogram')
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            prefix = label_text + ',' if label_text else ''
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+            suffix = '{' + label_text + '}' if label_text else ''
+            lines.append(f'{name}_sum{suffix} {histogram.sum}')
+            lines.append(f'{name}_count{suffix} {histogram.count}')
+        with self._lock:
+            counters = sorted(self._counters.items())
+        current = None
+        for (name, labels), total in counters:
+            if name != current:
+                current = name
+                lines.append(f'# HELP {name} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} counter')
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            suffix = '{' + label_text + '}' if label_text else ''
+            lines.append(f'{name}{suffix} {total}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class RerunProfiler:
+    """Cronometra as fases de um rerun"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases.append((name, elapsed))
+            REGISTRY.observe('pomodoro_phase_seconds', elapsed, phase=name)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class NullProfiler:
+    """Perfilador usado quando a instrumentação está desativada"""
+
+    phases = ()
+
+    @staticmethod
+    def phase(name):
+        return nullcontext()
+
+    @staticmethod
+    def elapsed():
+        return 0.0
+
+
+_NULL = NullProfiler()
+_local = threading.local()
+_last_profile = {}
+_metrics_file_written = [0.0]
+_server_lock = threading.Lock()
+_server = []
+
+
+def current():
+    """Perfilador do rerun em andamento nesta thread"""
+    return getattr(_local, 'profiler', _NULL)
+
+
+def last_profile(session_id):
+    """Caminho do último dump do cProfile gravado para a sessão"""
+    return _last_profile.get(session_id)
+
+
+def run(func, session_id=None, previous_rerun=None, profile=False, kind='full'):
+    """Executa um rerun do app com instrumentação
+
+    ``previous_rerun`` é o ``time.time()`` do rerun anterior da mesma sessão,
+    usado para medir reruns por segundo. ``kind`` rotula a duração: ``full``
+    para o script inteiro, ``fragment`` para um rerun que executa só um
+    fragmento. Com ``profile=True`` o rerun inteiro roda sob o cProfile e o
+    dump é gravado em ``PROFILE_DIR``.
+    """
+    if not ENABLED:
+        return func()
+
+    if previous_rerun is not None:
+        interval = time.time() - previous_rerun
+        if interval > 0:
+            REGISTRY.observe('pomodoro_session_reruns_per_second', 1 / interval,
+                             buckets=RATE_BUCKETS)
+
+    profiler = _local.profiler = RerunProfiler()
+    profile_run = cProfile.Profile() if profile else None
+    try:
+        if profile_run is not None:
+            profile_run.enable()
+        return func()
+    finally:
+        if profile_run is not None:
+            profile_run.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            label = ''.join(char for char in session_id or 'local' if char.isalnum())[:8]
+            path = os.path.join(PROFILE_DIR, f'rerun-{time.strftime("%Y%m%d-%H%M%S")}-{label}.prof')
+            profile_run.dump_stats(path)
+            _last_profile[session_id] = path
+        REGISTRY.observe('pomodoro_rerun_seconds', profiler.elapsed(), kind=kind)
+        del _local.profiler
+        export_metrics()
+
+
+def timed_query(func):
+    """Registra a latência de um método de acesso ao banco"""
+    if not ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            REGISTRY.observe('pomodoro_query_seconds', time.perf_counter() - started,
+                             method=func.__name__)
+    return wrapper
+
+
+def lock_wait(lock, seconds):
+    """Registra a espera por um lock do banco (``reader``, ``writer`` ou ``sqlite``)"""
+    REGISTRY.observe('pomodoro_db_lock_wait_seconds', seconds, buckets=LOCK_BUCKETS, lock=lock)
+
+
+def export_metrics():
+    """Atualiza o arquivo de métricas e sobe o endpoint local, se configurados"""
+    if METRICS_FILE:
+        now = time.monotonic()
+        if now - _metrics_file_written[0] >= METRICS_FILE_INTERVAL:
+            _metrics_file_written[0] = now
+            temporary = METRICS_FILE + '.tmp'
+            with open(temporary, 'w') as file:
+                file.write(REGISTRY.render())
+            os.replace(temporary, METRICS_FILE)
+    if METRICS_PORT and not _server:
+        start_metrics_server(int(METRICS_PORT))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Sobe o endpoint ``/metrics`` numa thread (uma vez por processo)
+
+    Se a porta estiver ocupada (outro worker com o mesmo ambiente), o erro é
+    registrado uma vez e o processo segue sem endpoint; retorna ``None``.
+    """
+    with _server_lock:
+        if _server:
+            return _server[0]
+        try:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as error:
+            logger.warning("Endpoint de métricas indisponível em %s:%d: %s", host, port, error)
+            _server.append(None)
+            return None
+        threading.Thread(target=server.serve_forever, name='metrics-server',
+                         daemon=True).start()
+        _server.append(server)
+        return server
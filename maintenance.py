@@ -0,0 +1,178 @@
+"""Retenção, compactação e manutenção do banco de estatísticas
+
+Cada sessão salva ou interrompida vira uma linha em ``sessions``, então o
+arquivo cresce para sempre. Com ``POMODORO_RETENTION_DAYS`` as linhas mais
+antigas que o prazo são somadas em ``archived_rollup`` (mesmo formato de
+``daily_rollup``) e apagadas. ``daily_rollup`` não muda, então os gráficos
+continuam mostrando os dias arquivados, e ``rebuild_rollup`` parte de
+``archived_rollup`` para não perdê-los. As análises de longo prazo (hora do
+dia, mapa de calor) precisam das linhas brutas e só cobrem o período retido.
+
+Uma única thread por processo percorre os bancos abertos a cada
+``POMODORO_MAINTENANCE_INTERVAL`` segundos: compacta em lotes curtos (o
+escritor fica livre entre um lote e outro), devolve páginas livres ao sistema
+com ``incremental_vacuum`` e atualiza as estatísticas do planejador com
+``PRAGMA optimize``. Bancos criados antes desta versão precisam de um
+``VACUUM`` completo, uma vez e com o app parado (sair do modo WAL exige
+acesso exclusivo), para passar a usar o vácuo incremental::
+
+    python database.py compact --vacuum
+"""
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date, timedelta
+
+RETENTION_DAYS = int(os.environ.get('POMODORO_RETENTION_DAYS', '0') or 0)  # 0: guarda tudo
+INTERVAL = float(os.environ.get('POMODORO_MAINTENANCE_INTERVAL', '3600') or 0)  # 0: desliga
+COMPACT_BATCH_ROWS = 10_000
+VACUUM_PAGES = 2_000  # ~8 MB por rodada, com páginas de 4 KB
+
+logger = logging.getLogger(__name__)
+
+SELECT_BATCH_BOUND = '''
+    SELECT MAX(id) FROM (
+        SELECT id FROM sessions WHERE date < ? ORDER BY id LIMIT ?
+    )
+'''
+
+ARCHIVE_BATCH = '''
+    INSERT INTO archived_rollup (user_id, date, session_type, completed, count, total_duration)
+    SELECT user_id, date, session_type, completed, COUNT(*), SUM(duration)
+    FROM sessions
+    WHERE date < :cutoff AND id <= :bound
+    GROUP BY user_id, date, session_type, completed
+    ON CONFLICT (user_id, date, session_type, completed) DO UPDATE SET
+        count = count + excluded.count,
+        total_duration = total_duration + excluded.total_duration
+'''
+
+DELETE_BATCH = '''
+    DELETE FROM sessions WHERE date < :cutoff AND id <= :bound
+'''
+
+
+def cutoff_date(retention_days, today=None):
+    """Primeiro dia mantido em ``sessions`` (``YYYY-MM-DD``)"""
+    today = today or date.today()
+    return (today - timedelta(days=retention_days - 1)).strftime('%Y-%m-%d')
+
+
+def compact(db, retention_days=RETENTION_DAYS, today=None, batch_rows=COMPACT_BATCH_ROWS):
+    """Move as sessões anteriores ao prazo para ``archived_rollup``
+
+    Cada lote é uma transação curta. Retorna o número de linhas arquivadas.
+    """
+    if retention_days <= 0:
+        return 0
+    cutoff = cutoff_date(retention_days, today)
+    archived = 0
+    while True:
+        with db.writer() as conn:
+            bound = conn.execute(SELECT_BATCH_BOUND, (cutoff, batch_rows)).fetchone()[0]
+            if bound is None:
+                break
+            params = {'cutoff': cutoff, 'bound': bound}
+            conn.execute(ARCHIVE_BATCH, params)
+            archived += conn.execute(DELETE_BATCH, params).rowcount
+    if archived:
+        # daily_rollup continua igual; só o que lê as linhas brutas muda
+        db.cache.invalidate()
+        analytics = sys.modules.get('analytics')
+        if analytics is not None:
+            analytics.reset_histories(db)
+    return archived
+
+
+def incremental_vacuum_enabled(db):
+    return db.fetchone('PRAGMA auto_vacuum')[0] == 2
+
+
+def enable_incremental_vacuum(path):
+    """Passa o banco para ``auto_vacuum = INCREMENTAL`` com um ``VACUUM`` completo
+
+    Usa uma conexão própria, antes de o banco ser aberto pelo ``database``:
+    nenhuma outra conexão pode estar aberta. Retorna ``False`` se o banco já
+    usava o vácuo incremental.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        conn.executescript('''
+            PRAGMA journal_mode = DELETE;
+            PRAGMA auto_vacuum = INCREMENTAL;
+            VACUUM;
+            PRAGMA journal_mode = WAL;
+        ''')
+        return True
+    finally:
+        conn.close()
+
+
+def vacuum_step(db, pages=VACUUM_PAGES):
+    """Devolve até ``pages`` páginas livres ao sistema; retorna as que restam"""
+    if incremental_vacuum_enabled(db) and db.fetchone('PRAGMA freelist_count')[0]:
+        db.run_pragmas(f'PRAGMA incremental_vacuum({int(pages)});')
+    return db.fetchone('PRAGMA freelist_count')[0]
+
+
+def run_once(db, retention_days=RETENTION_DAYS):
+    """Uma rodada completa de manutenção em um banco"""
+    archived = compact(db, retention_days)
+    vacuum_step(db)
+    db.run_pragmas('PRAGMA optimize;')
+    return archived
+
+
+class MaintenanceThread:
+    """Thread do processo que mantém todos os bancos abertos"""
+
+    def __init__(self, databases, interval=INTERVAL):
+        self.databases = databases
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for db in self.databases():
+                if db.closed:  # shard fechado por falta de uso
+                    continue
+                try:
+                    archived = run_once(db)
+                except Exception:
+                    logger.exception("Falha na manutenção de %s", db.path)
+                    continue
+                if archived:
+                    logger.info("%d sessões arquivadas em %s", archived, db.path)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+_thread = []
+_thread_lock = threading.Lock()
+
+
+def stop():
+    """Encerra a thread de manutenção, se estiver rodando"""
+    with _thread_lock:
+        while _thread:
+            _thread.pop().stop()
+
+
+def ensure_started(databases):
+    """Inicia a thread de manutenção na primeira chamada (se ``INTERVAL`` > 0)
+
+    ``databases`` é chamado a cada rodada e retorna os bancos abertos.
+    """
+    if INTERVAL <= 0 or _thread:
+        return
+    with _thread_lock:
+        if not _thread:
+            _thread.append(MaintenanceThread(databases))
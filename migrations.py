@@ -0,0 +1,221 @@
+"""Migrações do schema do banco de estatísticas
+
+Cada migração é aplicada uma única vez, em ordem, e registrada na tabela
+``schema_version``. Bancos criados por versões antigas do app (só com a tabela
+``sessions``) são atualizados no lugar na próxima vez que forem abertos.
+"""
+
+MIGRATIONS = (
+    (1, 'tabela sessions', (
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            session_type TEXT NOT NULL,
+            duration INTEGER NOT NULL,
+            completed BOOLEAN NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    )),
+    # Cobre as consultas de hoje, do dia e da semana: igualdade em completed,
+    # intervalo em date e agrupamento por session_type sem voltar à tabela
+    (2, 'índice de cobertura para estatísticas', (
+        '''
+        CREATE INDEX IF NOT EXISTS idx_sessions_completed_date
+        ON sessions (completed, date, session_type, duration)
+        ''',
+    )),
+    # Agregados diários mantidos pelo save_session na mesma transação
+    (3, 'tabela daily_rollup', (
+        '''
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            date TEXT NOT NULL,
+            session_type TEXT NOT NULL,
+            completed INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            total_duration INTEGER NOT NULL,
+            PRIMARY KEY (date, session_type, completed)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO daily_rollup (date, session_type, completed, count, total_duration)
+        SELECT date, session_type, completed, COUNT(*), SUM(duration)
+        FROM sessions
+        GROUP BY date, session_type, completed
+        ''',
+    )),
+    # Sessões passam a pertencer a um usuário; as linhas antigas ficam com o
+    # usuário padrão. Os índices e os agregados começam pelo user_id, para que
+    # as consultas de um usuário não dependam do volume dos demais.
+    (4, 'usuário nas sessões e nos agregados', (
+        '''
+        ALTER TABLE sessions ADD COLUMN user_id TEXT NOT NULL DEFAULT 'default'
+        ''',
+        '''
+        DROP INDEX IF EXISTS idx_sessions_completed_date
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_sessions_user_completed_date
+        ON sessions (user_id, completed, date, session_type, duration)
+        ''',
+        # O rowid fica implícito no fim do índice: cobre user_id = ? AND id > ?
+        '''
+        CREATE INDEX IF NOT EXISTS idx_sessions_user
+        ON sessions (user_id)
+        ''',
+        '''
+        CREATE TABLE daily_rollup_by_user (
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            session_type TEXT NOT NULL,
+            completed INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            total_duration INTEGER NOT NULL,
+            PRIMARY KEY (user_id, date, session_type, completed)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO daily_rollup_by_user
+            (user_id, date, session_type, completed, count, total_duration)
+        SELECT user_id, date, session_type, completed, COUNT(*), SUM(duration)
+        FROM sessions
+        GROUP BY user_id, date, session_type, completed
+        ''',
+        '''
+        DROP TABLE daily_rollup
+        ''',
+        '''
+        ALTER TABLE daily_rollup_by_user RENAME TO daily_rollup
+        ''',
+    )),
+    # Identifica uma sessão já gravada na importação sem varrer o dia inteiro
+    (5, 'índice de sessões por usuário e horário', (
+        '''
+        CREATE INDEX IF NOT EXISTS idx_sessions_user_timestamp
+        ON sessions (user_id, timestamp)
+        ''',
+    )),
+    # Agregados das sessões removidas pela política de retenção (maintenance)
+    (6, 'tabela archived_rollup', (
+        '''
+        CREATE TABLE IF NOT EXISTS archived_rollup (
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            session_type TEXT NOT NULL,
+            completed INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            total_duration INTEGER NOT NULL,
+            PRIMARY KEY (user_id, date, session_type, completed)
+        ) WITHOUT ROWID
+        ''',
+    )),
+    # Timer em andamento de cada usuário (timer_store), retomado por qualquer
+    # processo; deadline é o time.time() do fim da fase
+    (7, 'tabela timer_state', (
+        '''
+        CREATE TABLE IF NOT EXISTS timer_state (
+            user_id TEXT PRIMARY KEY,
+            phase TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            deadline REAL,
+            paused_remaining REAL,
+            cycle_count INTEGER NOT NULL,
+            work INTEGER NOT NULL,
+            short_break INTEGER NOT NULL,
+            long_break INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+    )),
+    # Muda só com as escritas que alteram as estatísticas (sessões e
+    # agregados, de qualquer conexão ou processo); os commits do timer_state
+    # não descartam o cache de estatísticas dos outros processos
+    (8, 'versão das estatísticas', (
+        '''
+        CREATE TABLE IF NOT EXISTS stats_version (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            version INTEGER NOT NULL
+        )
+        ''',
+        '''
+        INSERT OR IGNORE INTO stats_version (id, version) VALUES (0, 0)
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS stats_version_sessions_insert
+        AFTER INSERT ON sessions
+        BEGIN
+            UPDATE stats_version SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS stats_version_sessions_update
+        AFTER UPDATE ON sessions
+        BEGIN
+            UPDATE stats_version SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS stats_version_sessions_delete
+        AFTER DELETE ON sessions
+        BEGIN
+            UPDATE stats_version SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS stats_version_daily_rollup_insert
+        AFTER INSERT ON daily_rollup
+        BEGIN
+            UPDATE stats_version SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS stats_version_daily_rollup_update
+        AFTER UPDATE ON daily_rollup
+        BEGIN
+            UPDATE stats_version SET version = version + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS stats_version_daily_rollup_delete
+        AFTER DELETE ON daily_rollup
+        BEGIN
+            UPDATE stats_version SET version = version + 1;
+        END
+        ''',
+    )),
+)
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Obtém a versão do schema aplicada ao banco"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    """Aplica as migrações pendentes; deve rodar dentro de uma transação
+
+    Retorna a lista de versões aplicadas.
+    """
+    version = current_version(conn)
+    applied = []
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                     (number, description))
+        applied.append(number)
+    return applied
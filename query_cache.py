@@ -0,0 +1,54 @@
+"""Cache das consultas de estatísticas, invalidado pelas escritas
+
+Os resultados só mudam quando uma sessão é gravada, então cada entrada é
+guardada junto com a versão dos dados em que foi calculada. Cada escrita
+incrementa a versão; entre duas escritas os reruns não tocam no banco. As
+datas fazem parte dos parâmetros das consultas, então a virada do dia gera
+chaves novas automaticamente.
+"""
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 256
+
+
+class QueryCache:
+    """Cache LRU de resultados, chaveado por consulta, parâmetros e versão"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """Obtém o resultado de ``key``, calculando com ``compute()`` se preciso"""
+        with self._lock:
+            version = self.version
+            entry_key = (version, key)
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return self._entries[entry_key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            # Uma escrita durante o cálculo torna o resultado obsoleto
+            if version == self.version:
+                self._entries[entry_key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        """Marca todos os resultados como obsoletos após uma escrita"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,95 @@
+"""Agenda dos reruns automáticos de cada sessão do navegador
+
+Com o timer contando, o tempo restante é desenhado no navegador; o único
+rerun automático que sobra é o do relógio digital (um fragmento com
+``run_every``). Uma aba esquecida aberta a noite toda ainda faria esse rerun
+86.400 vezes, então o intervalo depende do estado da sessão:
+
+- aba visível, com interação recente: a cada segundo (``ACTIVE_INTERVAL``);
+- aba visível, sem interação há ``IDLE_AFTER`` segundos: a cada
+  ``IDLE_INTERVAL`` segundos, com o relógio mostrando só horas e minutos;
+- aba escondida com o timer contando: a cada ``HIDDEN_INTERVAL`` segundos;
+- aba escondida com o timer parado: nenhum rerun.
+
+O navegador só aceita um novo ``run_every`` num rerun completo, então
+quando o intervalo desejado muda o app pede um ``st.rerun()``. Qualquer
+interação (clique, slider, voltar para a aba) faz o intervalo voltar a um
+segundo na hora.
+"""
+import time
+
+import instrumentation
+
+ACTIVE_INTERVAL = 1.0
+IDLE_AFTER = 10 * 60
+IDLE_INTERVAL = 30.0
+HIDDEN_INTERVAL = 60.0
+
+
+def desired_interval(visible, counting, idle_for):
+    """Intervalo do relógio em segundos (``None``: sem reruns automáticos)"""
+    if not visible:
+        return HIDDEN_INTERVAL if counting else None
+    if counting or idle_for < IDLE_AFTER:
+        return ACTIVE_INTERVAL
+    return IDLE_INTERVAL
+
+
+class RerunSchedule:
+    """Visibilidade, última interação e intervalo registrado de uma sessão
+
+    Também conta os reruns automáticos feitos com o timer parado e o tempo
+    ocioso da sessão, para a métrica de reruns por hora ociosa.
+    """
+
+    __slots__ = ('visible', 'last_interaction', 'interval', 'last_rerun', 'idle',
+                 'idle_reruns', 'idle_seconds')
+
+    def __init__(self, now=None):
+        now = time.time() if now is None else now
+        self.visible = True
+        self.last_interaction = now
+        self.interval = ACTIVE_INTERVAL
+        self.last_rerun = now
+        self.idle = False
+        self.idle_reruns = 0
+        self.idle_seconds = 0.0
+
+    def interacted(self, now=None):
+        self.last_interaction = time.time() if now is None else now
+
+    def desired(self, counting, now=None):
+        now = time.time() if now is None else now
+        return desired_interval(self.visible, counting, now - self.last_interaction)
+
+    def needs_reschedule(self, counting, now=None):
+        """O intervalo registrado no navegador ficou desatualizado"""
+        return self.desired(counting, now) != self.interval
+
+    def record_rerun(self, counting, automatic, now=None):
+        """Contabiliza um rerun da sessão
+
+        O tempo desde o rerun anterior conta como ocioso se o timer estava
+        parado (o estado do timer só muda durante um rerun). Só os reruns
+        automáticos com o timer parado contam como reruns ociosos.
+        """
+        now = time.time() if now is None else now
+        elapsed = max(0.0, now - self.last_rerun)
+        if self.idle:
+            self.idle_seconds += elapsed
+            instrumentation.REGISTRY.increment('pomodoro_idle_session_seconds_total', elapsed)
+        if automatic and not counting:
+            self.idle_reruns += 1
+            instrumentation.REGISTRY.increment('pomodoro_idle_reruns_total')
+        self.last_rerun = now
+        self.idle = not counting
+
+    def idle_reruns_per_hour(self):
+        return self.idle_reruns / (self.idle_seconds / 3600) if self.idle_seconds else 0.0
+
+
+def idle_reruns_per_hour():
+    """Reruns automáticos por hora ociosa, somando todas as sessões do processo"""
+    seconds = instrumentation.REGISTRY.total('pomodoro_idle_session_seconds_total')
+    reruns = instrumentation.REGISTRY.total('pomodoro_idle_reruns_total')
+    return reruns / (seconds / 3600) if seconds else 0.0
@@ -0,0 +1,221 @@
+"""Exportação e importação em massa da tabela ``sessions``
+
+A exportação lê a tabela com um único ``SELECT`` (um snapshot consistente no
+modo WAL) em blocos de ``fetchmany`` e grava cada bloco assim que ele chega:
+CSV, JSON Lines ou Parquet (um row group por bloco, via ``pyarrow``). A
+importação lê o arquivo também em blocos e grava cada bloco numa transação
+com ``executemany``. Nos dois sentidos a memória usada depende só do tamanho
+do bloco, não do tamanho do histórico.
+
+Uma sessão importada é ignorada se já existir uma com o mesmo usuário, data,
+tipo, duração, conclusão e ``timestamp`` (a busca usa o índice
+``idx_sessions_user_timestamp``), então importar o mesmo arquivo duas
+vezes, ou o histórico de outra máquina com sessões em comum, não duplica
+nada. Sessões de dias já compactados pela política de retenção também são
+ignoradas: as linhas originais não existem mais para comparar e somá-las a
+``archived_rollup`` contaria de novo o que já estava lá. No fim,
+``daily_rollup`` é recalculada. Datas e horários precisam estar no formato
+gravado pelo app; sessões sem ``timestamp`` ficam ao meio-dia do seu dia.
+"""
+import csv
+import json
+import os
+import re
+from datetime import datetime
+
+from database import DEFAULT_USER
+
+CHUNK_ROWS = 50_000
+DATE_FORMAT = ('%Y-%m-%d', re.compile(r'\d{4}-\d{2}-\d{2}'))
+TIMESTAMP_FORMAT = ('%Y-%m-%d %H:%M:%S', re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}'))
+DEFAULT_TIME = '12:00:00'  # horário das sessões importadas sem timestamp
+FORMATS = ('csv', 'jsonl', 'parquet')
+COLUMNS = ('user_id', 'date', 'session_type', 'duration', 'completed', 'timestamp')
+
+SELECT_SESSIONS = '''
+    SELECT user_id, date, session_type, duration, completed, timestamp
+    FROM sessions
+    {where}
+    ORDER BY id
+'''
+
+SELECT_ARCHIVED_THROUGH = 'SELECT MAX(date) FROM archived_rollup'
+
+INSERT_NEW_SESSION = '''
+    INSERT INTO sessions (user_id, date, session_type, duration, completed, timestamp)
+    SELECT :user_id, :date, :session_type, :duration, :completed, :timestamp
+    WHERE NOT EXISTS (
+        SELECT 1 FROM sessions INDEXED BY idx_sessions_user_timestamp
+        WHERE user_id = :user_id AND timestamp IS :timestamp AND date = :date
+          AND session_type = :session_type AND duration = :duration
+          AND completed = :completed
+    )
+'''
+
+
+class TransferError(Exception):
+    """Arquivo ou formato inválido para exportação/importação"""
+
+
+def detect_format(path, fmt=None):
+    """Formato explícito ou deduzido da extensão do arquivo"""
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower().lstrip('.')
+        fmt = {'ndjson': 'jsonl', 'json': 'jsonl', 'pq': 'parquet'}.get(extension, extension)
+    if fmt not in FORMATS:
+        raise TransferError(f"formato desconhecido: {fmt!r} (use {', '.join(FORMATS)})")
+    return fmt
+
+
+def _parquet():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise TransferError("o formato parquet precisa do pacote pyarrow") from None
+    return pa, pq
+
+
+def iter_session_chunks(db, user_id=None, chunk_rows=CHUNK_ROWS):
+    """Blocos de linhas da tabela ``sessions``, na ordem de gravação"""
+    where, params = ('WHERE user_id = ?', (user_id,)) if user_id is not None else ('', ())
+    with db.reader() as conn:
+        cursor = conn.execute(SELECT_SESSIONS.format(where=where), params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+
+
+def export_sessions(db, path, fmt=None, user_id=None, chunk_rows=CHUNK_ROWS):
+    """Exporta as sessões para ``path``; retorna o número de linhas gravadas"""
+    fmt = detect_format(path, fmt)
+    chunks = iter_session_chunks(db, user_id, chunk_rows)
+    exported = 0
+
+    if fmt == 'parquet':
+        pa, pq = _parquet()
+        schema = pa.schema([('user_id', pa.string()), ('date', pa.string()),
+                            ('session_type', pa.string()), ('duration', pa.int64()),
+                            ('completed', pa.bool_()), ('timestamp', pa.string())])
+        with pq.ParquetWriter(path, schema) as writer:
+            for rows in chunks:
+                columns = list(zip(*rows))
+                columns[4] = [bool(value) for value in columns[4]]
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema))
+                exported += len(rows)
+        return exported
+
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        if fmt == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            for rows in chunks:
+                writer.writerows(rows)
+                exported += len(rows)
+        else:
+            for rows in chunks:
+                file.writelines(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + '\n'
+                                for row in rows)
+                exported += len(rows)
+    return exported
+
+
+def _read_records(path, fmt, chunk_rows):
+    """Registros (dicionários) do arquivo, lidos sob demanda"""
+    if fmt == 'parquet':
+        _, pq = _parquet()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield from batch.to_pylist()
+    elif fmt == 'csv':
+        with open(path, newline='', encoding='utf-8') as file:
+            yield from csv.DictReader(file)
+    else:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _parse_completed(value):
+    if isinstance(value, str):
+        return int(value.strip().lower() in ('1', 'true', 't', 'yes'))
+    return int(bool(value))
+
+
+def _parse_datetime(value, fmt):
+    """Texto de ``value`` no formato ``fmt`` que o app grava
+
+    O padrão exige os zeros à esquerda, que o ``strptime`` dispensa: as datas
+    são comparadas como texto.
+    """
+    text, pattern = fmt
+    value = str(value).strip()
+    if not pattern.fullmatch(value):
+        raise ValueError(f"{value!r} fora do formato {text}")
+    datetime.strptime(value, text)
+    return value
+
+
+def normalize(record, line, user_id=None):
+    """Valida um registro importado e o converte nos parâmetros do INSERT
+
+    ``date`` deve estar em ``YYYY-MM-DD`` e ``timestamp`` em ``YYYY-MM-DD
+    HH:MM:SS``, como o app grava. Sem ``timestamp``, a sessão fica ao meio-dia
+    do seu dia: um valor fixo, para que importar o arquivo de novo não a
+    duplique, e nunca nulo, que as análises de longo prazo não aceitam.
+    """
+    try:
+        day = _parse_datetime(record['date'], DATE_FORMAT)
+        timestamp = record.get('timestamp')
+        if timestamp is None or str(timestamp).strip() == '':
+            timestamp = f'{day} {DEFAULT_TIME}'
+        else:
+            timestamp = _parse_datetime(timestamp, TIMESTAMP_FORMAT)
+        return {
+            'user_id': user_id or record.get('user_id') or DEFAULT_USER,
+            'date': day,
+            'session_type': str(record['session_type']),
+            'duration': int(record['duration']),
+            'completed': _parse_completed(record['completed']),
+            'timestamp': timestamp,
+        }
+    except (KeyError, TypeError, ValueError) as error:
+        raise TransferError(f"registro {line} inválido: {error!r}") from None
+
+
+def import_sessions(db, path, fmt=None, user_id=None, chunk_rows=CHUNK_ROWS):
+    """Importa sessões de ``path``, ignorando as que já existem
+
+    ``user_id`` atribui todas as sessões do arquivo a um usuário. Retorna
+    ``(lidas, importadas)``.
+    """
+    fmt = detect_format(path, fmt)
+    archived_through = db.fetchone(SELECT_ARCHIVED_THROUGH)[0] or ''
+    read = imported = 0
+    batch = []
+
+    def flush():
+        nonlocal imported
+        with db.writer() as conn:
+            before = conn.total_changes
+            conn.executemany(INSERT_NEW_SESSION, batch)
+            imported += conn.total_changes - before
+        batch.clear()
+
+    for read, record in enumerate(_read_records(path, fmt, chunk_rows), start=1):
+        session = normalize(record, read, user_id)
+        if session['date'] <= archived_through:
+            continue
+        batch.append(session)
+        if len(batch) >= chunk_rows:
+            flush()
+    if batch:
+        flush()
+
+    if imported:
+        db.rebuild_rollup()
+    return read, imported
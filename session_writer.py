@@ -0,0 +1,210 @@
+"""Gravação assíncrona (write-behind) de sessões
+
+``save_session`` roda dentro do rerun do Streamlit; um fsync lento no commit
+trava a interface e vários usuários terminando sessões ao mesmo tempo
+serializam nos commits. Com o escritor em segundo plano, as sessões entram
+numa fila limitada e são gravadas em lote, numa única transação por
+intervalo de flush. As sessões ainda na fila continuam visíveis nas
+estatísticas através de ``pending_rollup()``.
+
+O commit de um lote acontece fora de ``lock``, para que as leituras das
+estatísticas não esperem por ele. Antes do commit o lote é registrado com o
+``id`` da sua última sessão; quem leu o banco sabe até que ``id`` a leitura
+viu e ``pending_rollup`` desconta os lotes já incluídos, então nenhuma
+sessão é contada duas vezes enquanto o lote sai da fila. O lote só sai do
+overlay depois de o commit invalidar o cache do banco; uma leitura anterior
+ao commit que chega ao overlay depois disso vê a versão do cache mudada e é
+refeita (``Database.daily_rollup``), então nenhuma sessão deixa de ser contada.
+"""
+import logging
+import queue
+import threading
+import time
+
+MAX_QUEUE = 10000
+FLUSH_INTERVAL = 0.5  # segundos
+SUBMIT_TIMEOUT = 1.0  # espera máxima por espaço na fila antes de gravar direto
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _add_rollup(rollup, key, count, total):
+    saved_count, saved_total = rollup.get(key, (0, 0))
+    count += saved_count
+    total += saved_total
+    if count:
+        rollup[key] = (count, total)
+    else:
+        rollup.pop(key, None)
+
+
+def _add_row(rollup, row, sign):
+    user_id, date, session_type, duration, completed = row
+    _add_rollup(rollup, (user_id, date, session_type, int(completed)), sign, sign * duration)
+
+
+class SessionWriter:
+    """Thread que grava as sessões enfileiradas em lotes"""
+
+    def __init__(self, db, max_queue=MAX_QUEUE, flush_interval=FLUSH_INTERVAL):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()  # protege o overlay pendente e os lotes em gravação
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = {}
+        self._landing = []  # [id da última sessão, agregados do lote] em commit
+        self._closed = False
+
+        self.submitted = 0
+        self.flushed = 0
+        self.batches = 0
+        self.blocked = 0
+        self.direct_writes = 0
+        self.failures = 0
+        self.last_flush_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._run, name='session-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """Enfileira sessões ``(user_id, date, session_type, duration, completed)``
+
+        Se a fila estiver cheia, espera até ``SUBMIT_TIMEOUT`` e depois grava
+        de forma síncrona, para nunca descartar sessões.
+        """
+        for row in rows:
+            self._add_pending(row, 1)
+            if self._closed:
+                self._write_direct(row)
+                continue
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self.blocked += 1
+                try:
+                    self._queue.put(row, timeout=SUBMIT_TIMEOUT)
+                except queue.Full:
+                    self._write_direct(row)
+                    continue
+            self.submitted += 1
+
+    def _write_direct(self, row):
+        self.direct_writes += 1
+        self._commit([row])
+
+    def _add_pending(self, row, sign):
+        with self.lock:
+            _add_row(self._pending, row, sign)
+
+    def pending_rollup(self, last_id):
+        """Agregados ``{(user_id, date, session_type, completed): (count, total)}`` ainda não gravados
+
+        ``last_id`` é o maior ``id`` de ``sessions`` visto pela leitura do
+        banco; os lotes com ``id`` até ele já estão nela e ficam de fora.
+        Deve ser chamado com ``self.lock`` adquirido.
+        """
+        landed = [rollup for batch_id, rollup in self._landing if batch_id <= last_id]
+        if not landed:
+            return self._pending
+        pending = dict(self._pending)
+        for rollup in landed:
+            for key, (count, total) in rollup.items():
+                _add_rollup(pending, key, -count, -total)
+        return pending
+
+    def _commit(self, batch):
+        rollup = {}
+        for row in batch:
+            _add_row(rollup, row, 1)
+        landing = []
+
+        def inserted(last_id):
+            # Dentro da transação: o lote é registrado antes de ficar visível
+            with self.lock:
+                landing.append((last_id, rollup))
+                self._landing.extend(landing)
+
+        def forget():
+            self._landing = [entry for entry in self._landing
+                             if not landing or entry is not landing[0]]
+
+        try:
+            self.db.insert_sessions(batch, on_inserted=inserted)
+        except BaseException:
+            # Nada foi gravado: o lote continua pendente para a nova tentativa
+            with self.lock:
+                forget()
+            raise
+        # Sai dos lotes em gravação e do overlay ao mesmo tempo
+        with self.lock:
+            forget()
+            for key, (count, total) in rollup.items():
+                _add_rollup(self._pending, key, -count, -total)
+
+    def _run(self):
+        batch = []
+        stopping = False
+        while not stopping or batch:
+            if not stopping:
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if row is _STOP:
+                        stopping = True
+                        break
+                    batch.append(row)
+            if stopping:
+                # Esvazia o que ainda estiver na fila
+                while True:
+                    try:
+                        row = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if row is not _STOP:
+                        batch.append(row)
+
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                self._commit(batch)
+            except Exception:
+                self.failures += 1
+                logger.exception("Falha ao gravar %d sessões; nova tentativa no próximo flush",
+                                 len(batch))
+                if stopping:
+                    break
+                continue
+            self.last_flush_seconds = time.perf_counter() - started
+            self.flushed += len(batch)
+            self.batches += 1
+            batch = []
+
+    def close(self):
+        """Grava tudo o que estiver pendente e encerra a thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def metrics(self):
+        """Contadores de fila e gravação"""
+        return {
+            'queue_depth': self._queue.qsize(),
+            'submitted': self.submitted,
+            'flushed': self.flushed,
+            'batches': self.batches,
+            'blocked': self.blocked,
+            'direct_writes': self.direct_writes,
+            'failures': self.failures,
+            'last_flush_seconds': self.last_flush_seconds,
+        }
@@ -0,0 +1,170 @@
+"""Motor do timer Pomodoro, independente do Streamlit
+
+O estado guarda apenas o prazo final no relógio monotônico (ou o tempo
+restante quando pausado), então o tempo restante e a próxima transição são
+funções O(1) de ``now``. A interface pode renderizar em qualquer frequência,
+ou em nenhuma, sem perder precisão.
+"""
+import math
+import time
+
+WORK = 'work'
+SHORT_BREAK = 'short_break'
+LONG_BREAK = 'long_break'
+
+# Pausa longa a cada 4 sessões de trabalho completadas
+LONG_BREAK_EVERY = 4
+
+
+class Durations:
+    """Duração de cada fase, em segundos"""
+
+    __slots__ = ('work', 'short_break', 'long_break')
+
+    def __init__(self, work=25 * 60, short_break=5 * 60, long_break=15 * 60):
+        self.work = work
+        self.short_break = short_break
+        self.long_break = long_break
+
+    def for_phase(self, phase):
+        """Obtém a duração de uma fase"""
+        if phase == WORK:
+            return self.work
+        if phase == LONG_BREAK:
+            return self.long_break
+        return self.short_break
+
+
+class TimerState:
+    """Estado compacto de um timer
+
+    - parado: ``deadline`` e ``paused_remaining`` são ``None``
+    - rodando: ``deadline`` guarda o ``time.monotonic()`` do fim da fase
+    - pausado: ``paused_remaining`` guarda os segundos que faltavam
+    """
+
+    __slots__ = ('phase', 'total', 'deadline', 'paused_remaining', 'cycle_count')
+
+    def __init__(self, total, phase=WORK, cycle_count=0):
+        self.phase = phase
+        self.total = total
+        self.deadline = None
+        self.paused_remaining = None
+        self.cycle_count = cycle_count
+
+    @property
+    def is_running(self):
+        return self.deadline is not None or self.paused_remaining is not None
+
+    @property
+    def is_paused(self):
+        return self.paused_remaining is not None
+
+    @property
+    def is_work_session(self):
+        return self.phase == WORK
+
+    @property
+    def session_type(self):
+        """Tipo gravado na tabela ``sessions`` (``work`` ou ``break``)"""
+        return 'work' if self.phase == WORK else 'break'
+
+    def __repr__(self):
+        return (f"TimerState(phase={self.phase!r}, total={self.total!r}, "
+                f"deadline={self.deadline!r}, paused_remaining={self.paused_remaining!r}, "
+                f"cycle_count={self.cycle_count!r})")
+
+
+def remaining(state, now=None):
+    """Segundos restantes na fase atual"""
+    if state.deadline is not None:
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, state.deadline - now)
+    if state.paused_remaining is not None:
+        return state.paused_remaining
+    return float(state.total)
+
+
+def remaining_seconds(state, now=None):
+    """Segundos restantes arredondados para cima, como exibidos no display"""
+    return math.ceil(remaining(state, now))
+
+
+def next_transition(state, now=None):
+    """Segundos até a próxima transição automática, ou ``None`` se não houver"""
+    if state.deadline is None:
+        return None
+    return remaining(state, now)
+
+
+def is_expired(state, now=None):
+    """Indica se a fase em andamento já chegou ao fim"""
+    return state.deadline is not None and remaining(state, now) <= 0
+
+
+def start_timer(state, now=None):
+    """Inicia o timer; não faz nada se ele já estiver rodando ou pausado"""
+    if state.is_running:
+        return False
+    if now is None:
+        now = time.monotonic()
+    state.deadline = now + state.total
+    return True
+
+
+def pause_timer(state, now=None):
+    """Pausa o timer em andamento ou retoma o timer pausado"""
+    if now is None:
+        now = time.monotonic()
+    if state.paused_remaining is not None:
+        state.deadline = now + state.paused_remaining
+        state.paused_remaining = None
+        return True
+    if state.deadline is not None:
+        state.paused_remaining = remaining(state, now)
+        state.deadline = None
+        return True
+    return False
+
+
+def stop_timer(state, durations, now=None):
+    """Interrompe a fase atual e volta para uma sessão de trabalho
+
+    Retorna ``(session_type, elapsed, False)`` para ser salvo como sessão
+    incompleta, ou ``None`` se o timer não estava rodando.
+    """
+    if not state.is_running:
+        return None
+    elapsed = int(state.total - remaining(state, now))
+    record = (state.session_type, elapsed, False)
+    reset_timer(state, durations)
+    return record
+
+
+def reset_timer(state, durations):
+    """Volta para o início de uma sessão de trabalho, mantendo o ciclo"""
+    state.phase = WORK
+    state.total = durations.work
+    state.deadline = None
+    state.paused_remaining = None
+
+
+def complete_session(state, durations):
+    """Encerra a fase atual e prepara a próxima
+
+    Retorna ``(session_type, duration, True)`` da fase completada.
+    """
+    record = (state.session_type, state.total, True)
+    if state.phase == WORK:
+        state.cycle_count += 1
+        if state.cycle_count % LONG_BREAK_EVERY == 0:
+            state.phase = LONG_BREAK
+        else:
+            state.phase = SHORT_BREAK
+    else:
+        state.phase = WORK
+    state.total = durations.for_phase(state.phase)
+    state.deadline = None
+    state.paused_remaining = None
+    return record
@@ -0,0 +1,362 @@
+"""Serviço de timers sem interface (salas de foco, bots, quiosques)
+
+Mantém milhares de timers Pomodoro num único processo asyncio, sem uma
+sessão do Streamlit por timer. Os prazos ficam num heap ordenado pelo
+``deadline`` do ``timer_engine``; o laço dorme até o prazo mais próximo,
+completa as fases vencidas com ``timer_engine.complete_session`` (mesma
+cadência do app: pausa longa a cada 4 sessões de trabalho), inicia a fase
+seguinte a partir do prazo anterior, para não acumular atraso, e grava as
+sessões na tabela ``sessions``, pelo escritor em segundo plano do
+``database`` (as transições de muitos timers viram poucos commits). Com
+``POMODORO_SHARD_DIR`` as sessões de cada usuário vão para o banco dele
+(``database.for_user``), o mesmo que o app lê; ``--db`` só vale sem shards.
+
+Comandos chegam por uma API local em JSON lines (uma requisição por linha)::
+
+    python timer_service.py serve --port 8765
+    python timer_service.py request create id=sala-1 user=time-a work=1500
+    python timer_service.py request start id=sala-1
+    python timer_service.py request list
+    python timer_service.py request watch     # transições, uma por linha
+
+Entradas de heap antigas (de timers pausados, parados ou removidos) não são
+removidas: cada timer tem uma ``generation`` e entradas desatualizadas são
+descartadas quando chegam ao topo.
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+
+import database
+import timer_engine
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceError(Exception):
+    """Requisição inválida para o serviço"""
+
+
+def parse_duration(name, value, default):
+    """Duração em segundos de uma requisição: inteiro positivo (ou texto com um)
+
+    Uma duração zero ou negativa deixaria o prazo de cada fase já vencido e o
+    ``fire_due`` completaria fases sem fim.
+    """
+    if value is None:
+        return default
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ServiceError(f"{name} deve ser um inteiro positivo de segundos, não {value!r}")
+    return value
+
+
+class ManagedTimer:
+    """Um timer do serviço e a quem ele pertence"""
+
+    __slots__ = ('timer_id', 'user_id', 'durations', 'state', 'generation')
+
+    def __init__(self, timer_id, user_id, durations):
+        self.timer_id = timer_id
+        self.user_id = user_id
+        self.durations = durations
+        self.state = timer_engine.TimerState(durations.work)
+        self.generation = 0
+
+    def to_dict(self, now=None):
+        state = self.state
+        return {
+            'id': self.timer_id,
+            'user': self.user_id,
+            'phase': state.phase,
+            'running': state.deadline is not None,
+            'paused': state.is_paused,
+            'remaining': timer_engine.remaining_seconds(state, now),
+            'total': state.total,
+            'cycle_count': state.cycle_count,
+        }
+
+
+class TimerService:
+    """Agenda as transições de fase de muitos timers"""
+
+    def __init__(self, db=None, auto_continue=True):
+        self.db = db
+        self.auto_continue = auto_continue
+        self.timers = {}
+        self.completed = 0
+        self._heap = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._watchers = set()
+
+    # Comandos
+
+    def create(self, timer_id, user_id=database.DEFAULT_USER, work=None, short_break=None,
+               long_break=None):
+        if timer_id in self.timers:
+            raise ServiceError(f"timer {timer_id!r} já existe")
+        defaults = timer_engine.Durations()
+        durations = timer_engine.Durations(
+            parse_duration('work', work, defaults.work),
+            parse_duration('short_break', short_break, defaults.short_break),
+            parse_duration('long_break', long_break, defaults.long_break))
+        timer = self.timers[timer_id] = ManagedTimer(timer_id, user_id, durations)
+        return timer
+
+    def get(self, timer_id):
+        try:
+            return self.timers[timer_id]
+        except KeyError:
+            raise ServiceError(f"timer {timer_id!r} não existe") from None
+
+    def start(self, timer_id, now=None):
+        timer = self.get(timer_id)
+        if timer_engine.start_timer(timer.state, now):
+            self._schedule(timer)
+        return timer
+
+    def pause(self, timer_id, now=None):
+        """Pausa ou retoma o timer"""
+        timer = self.get(timer_id)
+        if timer_engine.pause_timer(timer.state, now):
+            self._schedule(timer)
+        return timer
+
+    def stop(self, timer_id, now=None):
+        """Interrompe a fase atual, gravando-a como incompleta"""
+        timer = self.get(timer_id)
+        record = timer_engine.stop_timer(timer.state, timer.durations, now)
+        if record is not None:
+            timer.generation += 1
+            self._persist([self._row(timer, record)])
+        return timer
+
+    def reset(self, timer_id):
+        timer = self.get(timer_id)
+        timer_engine.reset_timer(timer.state, timer.durations)
+        timer.generation += 1
+        return timer
+
+    def remove(self, timer_id):
+        timer = self.timers.pop(timer_id, None)
+        if timer is None:
+            raise ServiceError(f"timer {timer_id!r} não existe")
+        timer.generation += 1
+        return timer
+
+    # Agendamento
+
+    def _schedule(self, timer):
+        """Invalida a entrada anterior do timer e agenda o novo prazo, se houver"""
+        timer.generation += 1
+        deadline = timer.state.deadline
+        if deadline is None:
+            return
+        first = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (deadline, next(self._sequence), timer, timer.generation))
+        if first is None or deadline < first:
+            self._wakeup.set()
+
+    def fire_due(self, now=None):
+        """Completa todas as fases vencidas; retorna as transições
+
+        A fase seguinte começa no prazo da anterior, então um laço atrasado
+        não empurra a agenda do timer para frente.
+        """
+        if now is None:
+            now = time.monotonic()
+        events, rows = [], []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, _, timer, generation = heapq.heappop(heap)
+            if generation != timer.generation or timer.state.deadline != deadline:
+                continue
+            record = timer_engine.complete_session(timer.state, timer.durations)
+            rows.append(self._row(timer, record))
+            self.completed += 1
+            if self.auto_continue:
+                timer_engine.start_timer(timer.state, now=deadline)
+                self._schedule(timer)
+            else:
+                timer.generation += 1
+            event = timer.to_dict(now)
+            event['completed'] = record[0]
+            events.append(event)
+        if rows:
+            self._persist(rows)
+        return events
+
+    def next_deadline(self):
+        """Prazo mais próximo ainda válido, descartando entradas antigas"""
+        heap = self._heap
+        while heap:
+            deadline, _, timer, generation = heap[0]
+            if generation == timer.generation and timer.state.deadline == deadline:
+                return deadline
+            heapq.heappop(heap)
+        return None
+
+    def _row(self, timer, record):
+        session_type, duration, completed = record
+        return (timer.user_id, datetime.now().strftime('%Y-%m-%d'), session_type, duration,
+                completed)
+
+    def _persist(self, rows):
+        if self.db is None:
+            return
+        if not database.SHARD_DIR:
+            self.db.save_sessions(rows)
+            return
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row[0], []).append(row)
+        for user_id, user_rows in by_user.items():
+            database.for_user(user_id).save_sessions(user_rows)
+
+    async def run(self):
+        """Laço do agendador; dorme até o próximo prazo ou até um novo timer mais cedo"""
+        while True:
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            for event in self.fire_due():
+                self._publish(event)
+
+    def _publish(self, event):
+        line = (json.dumps(event, ensure_ascii=False) + '\n').encode()
+        for writer in list(self._watchers):
+            if writer.is_closing():
+                self._watchers.discard(writer)
+            else:
+                writer.write(line)
+
+    # API local em JSON lines
+
+    def handle(self, request):
+        """Executa uma requisição ``{"op": ..., ...}`` e retorna a resposta"""
+        op = request.get('op')
+        if op == 'list':
+            now = time.monotonic()
+            return {'ok': True, 'timers': [timer.to_dict(now) for timer in self.timers.values()]}
+        if op == 'stats':
+            return {'ok': True, 'timers': len(self.timers), 'scheduled': len(self._heap),
+                    'completed': self.completed}
+        if op == 'create':
+            durations = {name: request.get(name) for name in ('work', 'short_break', 'long_break')}
+            timer = self.create(request['id'], request.get('user', database.DEFAULT_USER),
+                                **durations)
+        elif op in ('start', 'pause', 'stop', 'reset', 'remove', 'status'):
+            timer = self.get(request['id']) if op == 'status' else getattr(self, op)(request['id'])
+        else:
+            raise ServiceError(f"operação desconhecida: {op!r}")
+        return {'ok': True, 'timer': timer.to_dict()}
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if request.get('op') == 'watch':
+                        self._watchers.add(writer)
+                        response = {'ok': True, 'watching': True}
+                    else:
+                        response = self.handle(request)
+                except (ServiceError, KeyError, ValueError, TypeError) as error:
+                    response = {'ok': False, 'error': str(error)}
+                writer.write((json.dumps(response, ensure_ascii=False) + '\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._watchers.discard(writer)
+            writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, db=None):
+    """Sobe o agendador e a API local"""
+    service = TimerService(db)
+    server = await asyncio.start_server(service.serve_client, host, port)
+    logger.info("Serviço de timers em %s:%d", host, port)
+    async with server:
+        await asyncio.gather(server.serve_forever(), service.run())
+
+
+def send_request(request, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Envia uma requisição ao serviço e imprime a resposta (ou os eventos, em ``watch``)"""
+    import socket
+
+    with socket.create_connection((host, port)) as connection:
+        connection.sendall((json.dumps(request) + '\n').encode())
+        with connection.makefile('r', encoding='utf-8') as lines:
+            for line in lines:
+                print(line, end='', flush=True)
+                if request.get('op') != 'watch':
+                    return json.loads(line).get('ok', False)
+    return True
+
+
+def parse_fields(fields):
+    """Converte ``chave=valor`` da linha de comando em campos da requisição"""
+    request = {}
+    for field in fields:
+        key, separator, value = field.partition('=')
+        if not separator:
+            raise SystemExit(f"campo inválido: {field!r} (use chave=valor)")
+        request[key] = value
+    return request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço de timers Pomodoro sem interface")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help="roda o agendador e a API local")
+    serve_parser.add_argument('--db', default=database.DEFAULT_PATH,
+                              help="caminho do banco SQLite (sem POMODORO_SHARD_DIR)")
+    request_parser = subparsers.add_parser('request', help="envia um comando ao serviço")
+    request_parser.add_argument('op', choices=('create', 'start', 'pause', 'stop', 'reset',
+                                               'remove', 'status', 'list', 'stats', 'watch'))
+    request_parser.add_argument('fields', nargs='*', metavar='chave=valor')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        logging.basicConfig(level=logging.INFO)
+        db = database.Database(args.db, write_behind=True)
+        try:
+            asyncio.run(serve(args.host, args.port, db))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            db.close()
+        return 0
+
+    request = parse_fields(args.fields)
+    request['op'] = args.op
+    try:
+        return 0 if send_request(request, args.host, args.port) else 1
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
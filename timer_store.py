@@ -0,0 +1,143 @@
+"""Estado do timer de cada usuário gravado no banco (POMODORO_TIMER_STORE=1)
+
+Sem esta opção o timer vive só no ``st.session_state``: reiniciar o processo
+do Streamlit, ou reconectar num outro processo atrás de um balanceador,
+perde o Pomodoro em andamento. Com ela, o estado de cada usuário fica na
+tabela ``timer_state`` do banco dele (``database.for_user``) e qualquer
+processo que abra uma sessão do usuário retoma o timer de onde parou.
+
+A linha guarda o que o ``timer_engine`` guarda: fase, duração, prazo final
+ou tempo restante da pausa e o contador de ciclos, mais as durações
+configuradas. Nada muda enquanto o timer conta, então só as transições
+gravam (iniciar, pausar, retomar, parar, resetar, completar, salvar
+configurações). O prazo é gravado no relógio de parede (``time.time()``),
+porque o ``time.monotonic()`` de um processo não vale em outro; entre
+máquinas os relógios precisam estar sincronizados (NTP).
+
+Cada gravação incrementa ``version``. Uma sessão só grava sobre a versão que
+leu: se outra aba ou outro processo gravou antes, ``save`` não grava nada e
+a sessão adota o estado gravado, então uma fase nunca é completada (e salva
+em ``sessions``) duas vezes.
+
+Visitantes anônimos (sem login nem ``?user=``) compartilham o usuário padrão
+e não têm timer gravado: cada navegador continua com o seu.
+
+A leitura acontece a cada rerun e fica guardada até o próximo commit no
+banco (``PRAGMA data_version``), fora do cache de consultas: uma transição
+do timer não descarta as estatísticas, figuras e análises em cache, nem neste
+processo nem nos outros (a tabela ``stats_version`` só muda com sessões).
+"""
+import os
+import threading
+import time
+
+import timer_engine
+from database import DEFAULT_USER
+
+ENABLED = os.environ.get('POMODORO_TIMER_STORE', '') == '1'
+
+SELECT_TIMER = '''
+    SELECT phase, total, deadline, paused_remaining, cycle_count,
+           work, short_break, long_break, version
+    FROM timer_state
+    WHERE user_id = ?
+'''
+
+SELECT_VERSION = '''
+    SELECT version FROM timer_state WHERE user_id = ?
+'''
+
+UPSERT_TIMER = '''
+    INSERT INTO timer_state (user_id, phase, total, deadline, paused_remaining, cycle_count,
+                             work, short_break, long_break, version, updated_at)
+    VALUES (:user_id, :phase, :total, :deadline, :paused_remaining, :cycle_count,
+            :work, :short_break, :long_break, :version, :updated_at)
+    ON CONFLICT (user_id) DO UPDATE SET
+        phase = excluded.phase,
+        total = excluded.total,
+        deadline = excluded.deadline,
+        paused_remaining = excluded.paused_remaining,
+        cycle_count = excluded.cycle_count,
+        work = excluded.work,
+        short_break = excluded.short_break,
+        long_break = excluded.long_break,
+        version = excluded.version,
+        updated_at = excluded.updated_at
+'''
+
+
+_rows = {}  # (banco, usuário) -> (data_version, linha)
+_rows_lock = threading.Lock()
+
+
+def enabled_for(user_id):
+    """O timer do usuário é gravado (nunca o do usuário padrão, compartilhado)"""
+    return ENABLED and user_id != DEFAULT_USER
+
+
+class StoredTimer:
+    """Estado gravado de um timer, com o prazo já no relógio deste processo"""
+
+    __slots__ = ('state', 'durations', 'version')
+
+    def __init__(self, state, durations, version):
+        self.state = state
+        self.durations = durations
+        self.version = version
+
+
+def load(db, user_id):
+    """Obtém o timer gravado do usuário (``None`` se nunca foi gravado)
+
+    A linha só é lida de novo depois de um commit no banco (deste ou de
+    outro processo), então pode rodar a cada rerun.
+    """
+    key = (db.path, user_id)
+    version = db.data_version()
+    with _rows_lock:
+        cached = _rows.get(key)
+    if cached is not None and cached[0] == version:
+        row = cached[1]
+    else:
+        row = db.fetchone(SELECT_TIMER, (user_id,))
+        with _rows_lock:
+            _rows[key] = (version, row)
+    if row is None:
+        return None
+    (phase, total, deadline, paused_remaining, cycle_count,
+     work, short_break, long_break, version) = row
+    state = timer_engine.TimerState(total, phase, cycle_count)
+    if deadline is not None:
+        state.deadline = deadline - time.time() + time.monotonic()
+    state.paused_remaining = paused_remaining
+    return StoredTimer(state, timer_engine.Durations(work, short_break, long_break), version)
+
+
+def save(db, user_id, state, durations, version):
+    """Grava o estado do timer sobre a versão ``version`` lida pela sessão
+
+    Retorna a nova versão, ou ``None`` se a gravada já não é ``version``
+    (outra sessão gravou antes); nesse caso nada é gravado.
+    """
+    now = time.time()
+    deadline = None
+    if state.deadline is not None:
+        deadline = state.deadline - time.monotonic() + now
+    with db.writer() as conn:
+        row = conn.execute(SELECT_VERSION, (user_id,)).fetchone()
+        if (row[0] if row else 0) != version:
+            return None
+        conn.execute(UPSERT_TIMER, {
+            'user_id': user_id,
+            'phase': state.phase,
+            'total': state.total,
+            'deadline': deadline,
+            'paused_remaining': state.paused_remaining,
+            'cycle_count': state.cycle_count,
+            'work': durations.work,
+            'short_break': durations.short_break,
+            'long_break': durations.long_break,
+            'version': version + 1,
+            'updated_at': now,
+        })
+    return version + 1
@@ -0,0 +1,42 @@
+"""Componentes customizados renderizados no navegador"""
+import os
+
+import streamlit.components.v1 as components
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_countdown = components.declare_component(
+    "countdown", path=os.path.join(_BASE_DIR, "countdown")
+)
+
+_assets = components.declare_component(
+    "assets", path=os.path.join(_BASE_DIR, "assets")
+)
+
+
+def countdown(remaining, total, running, token, key=None):
+    """Exibe a contagem regressiva e a barra de progresso no navegador
+
+    O componente calcula o tempo restante localmente e só devolve um valor
+    ao servidor quando o prazo expira: ``{"event": "expired", "token": token}``.
+    """
+    return _countdown(
+        remaining=remaining,
+        total=total,
+        running=running,
+        token=token,
+        key=key,
+        default=None,
+    )
+
+
+def app_assets(sound=None, key=None):
+    """Carrega o CSS do app e toca os sons, sem reenviar nada a cada rerun
+
+    O iframe do componente é servido como arquivo estático: injeta
+    ``assets/app.css`` no documento principal uma única vez e toca
+    ``sound`` (``{"name": "start" | "complete", "id": ...}``) quando o
+    ``id`` muda. O componente fica invisível e devolve ``{"visible": bool}``
+    quando a aba do navegador é escondida ou volta a aparecer.
+    """
+    return _assets(sound=sound, key=key, default=None)